@@ -4,14 +4,11 @@ Example: Flow Rate Calibration for Solid Doser
 Run this script to calibrate the solid doser flow rate.
 """
 
-import logging
-from dose_every_well import CNCDosingSystem
+import traceback
+from dose_every_well import CNCDosingSystem, configure_once
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_once()
 
 def main():
     print("=== Solid Doser Flow Rate Calibration ===\n")
@@ -68,8 +65,8 @@ def main():
         
         print(f"\nCalculated flow rate: {flow_rate:.2f} mg/s")
         print(f"\nTo use this calibration:")
-        print(f"  1. Update CNCDosingSystem._calculate_duration() method")
-        print(f"  2. Set: flow_rate = {flow_rate:.2f}  # mg/s")
+        print(f"  1. Pass flow_rate={flow_rate:.2f} to CNCDosingSystem(...)")
+        print(f"  2. Or set dosing.flow_rate = {flow_rate:.2f} on a running system")
         print(f"  3. Or update config file: flow_rate_mg_per_s: {flow_rate:.2f}")
         
         # Optional: Run verification
@@ -108,7 +105,6 @@ def main():
         print("\n\nInterrupted by user")
     except Exception as e:
         print(f"\n✗ Error: {e}")
-        import traceback
         traceback.print_exc()
     finally:
         dosing.shutdown()
@@ -4,14 +4,11 @@ Example: MicroDoser in Standalone Mode
 Demonstrates basic weighing station functionality without automated dosing.
 """
 
-import logging
-from dose_every_well import MicroDoser
+import traceback
+from dose_every_well import MicroDoser, configure_once
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_once()
 
 def main():
     print("=== MicroDoser Standalone Example ===")
@@ -32,12 +29,19 @@ def main():
         # Manual dosing workflow
         print("2. Manual dosing workflow:")
         wells = ['A1', 'A2', 'A3']
+        print(f"   Wells to dose: {', '.join(wells)}\n")
         
-        for well in wells:
-            input(f"   Add material to well {well}, then press Enter...")
-            mass_g = doser.read_balance()
-            mass_mg = mass_g * 1000
-            print(f"   {well}: {mass_mg:.2f} mg\n")
+        # Monitor the balance continuously so each well only waits for
+        # the reading to settle instead of a full weigh cycle
+        doser.balance.start_continuous()
+        try:
+            for well in wells:
+                input(f"   Add material to well {well}, then press Enter...")
+                mass_g = doser.balance.latest_stable(window=4, tau=0.08)
+                mass_mg = mass_g * 1000
+                print(f"   {well}: {mass_mg:.2f} mg\n")
+        finally:
+            doser.balance.stop_continuous()
         
         # Unload plate
         print("3. Unloading plate...")
@@ -49,7 +53,6 @@ def main():
         print("\n\nInterrupted by user")
     except Exception as e:
         print(f"\n✗ Error: {e}")
-        import traceback
         traceback.print_exc()
     finally:
         doser.shutdown()
@@ -57,4 +60,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -4,14 +4,12 @@ Example: MicroDoser with CNC Dosing System
 Demonstrates automated solid dosing with gravimetric verification.
 """
 
-import logging
-from dose_every_well import MicroDoser, CNCDosingSystem
+import sys
+import traceback
+from dose_every_well import MicroDoser, CNCDosingSystem, configure_once
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_once()
 
 def main():
     print("=== MicroDoser with CNC Dosing Example ===")
@@ -62,12 +60,18 @@ def main():
         
         results = doser.dose_plate(well_targets, verify=True)
         
-        print("\n   Summary:")
-        print("   Well | Target (mg) | Actual (mg) | Error (mg) | Error (%)")
-        print("   " + "-" * 60)
-        for well, result in results.items():
-            error_pct = result['error_mg'] / result['target_mg'] * 100
-            print(f"   {well:4s} | {result['target_mg']:11.2f} | {result['actual_mg']:11.2f} | {result['error_mg']:10.2f} | {error_pct:8.1f}")
+        # Build the whole table and write it at once
+        lines = [
+            "\n   Summary:",
+            "   Well | Target (mg) | Actual (mg) | Error (mg) | Error (%)",
+            "   " + "-" * 60
+        ]
+        lines.extend(
+            f"   {well:4s} | {r['target_mg']:11.2f} | {r['actual_mg']:11.2f} | "
+            f"{r['error_mg']:10.2f} | {r['error_mg'] / r['target_mg'] * 100:8.1f}"
+            for well, r in results.items()
+        )
+        sys.stdout.write("\n".join(lines) + "\n")
         
         # Unload plate
         print("\n4. Unloading plate...")
@@ -79,7 +83,6 @@ def main():
         print("\n\nInterrupted by user")
     except Exception as e:
         print(f"\n✗ Error: {e}")
-        import traceback
         traceback.print_exc()
     finally:
         doser.shutdown()
@@ -3,43 +3,67 @@ dose_every_well - Precision Dosing and Weighing System
 
 Main Components:
 - MicroDoser: Core system (balance + plate loader + optional dosing)
+- DoseResult: Per-well dosing result returned by MicroDoser
 - CNCDosingSystem: CNC-based solid dosing integration
 
 Legacy Components (backward compatibility):
 - CNC_Controller, CNC_Simulator: Direct CNC control
 - PlateLoader: Direct plate loader control
 - SolidDoser: Direct solid doser control
+
+Logging:
+- configure_once(): Set up root logging in the package's standard format.
+  Scripts should call this instead of logging.basicConfig(); it is a no-op
+  after the first call, so re-running a script or notebook cell is cheap.
+
+Components are imported on first attribute access (PEP 562), so importing the
+package does not load pyserial, matplotlib or the Raspberry Pi hardware
+libraries until a component that needs them is used.
 """
 
-# New high-level API
-try:
-    from .core import MicroDoser
-    from .dosing_system import CNCDosingSystem
-    _new_api_available = True
-except (ImportError, Exception) as e:
-    import warnings
-    warnings.warn(f"MicroDoser API not available: {e}", UserWarning)
-    _new_api_available = False
-
-# Legacy API (backward compatibility)
-from .cnc_controller import load_config, find_port, CNC_Controller, CNC_Simulator
-
-try:
-    from .plate_loader import PlateLoader
-    from .solid_doser import SolidDoser
-    _legacy_hardware_available = True
-except (ImportError, NameError, Exception) as e:
-    import warnings
-    warnings.warn(f"Raspberry Pi hardware controllers not available: {e}", UserWarning)
-    _legacy_hardware_available = False
-    PlateLoader = None
-    SolidDoser = None
-
-# Build __all__ based on what's available
-__all__ = ['load_config', 'find_port', 'CNC_Controller', 'CNC_Simulator']
-
-if _new_api_available:
-    __all__.extend(['MicroDoser', 'CNCDosingSystem'])
-
-if _legacy_hardware_available:
-    __all__.extend(['PlateLoader', 'SolidDoser'])
+import importlib
+import warnings
+
+# Public name -> submodule defining it
+_LAZY_IMPORTS = {
+    # New high-level API
+    'MicroDoser': '.core',
+    'DoseResult': '.core',
+    'configure_once': '._logconfig',
+    'CNCDosingSystem': '.dosing_system',
+    # Legacy API (backward compatibility)
+    'load_config': '.cnc_controller',
+    'find_port': '.cnc_controller',
+    'CNC_Controller': '.cnc_controller',
+    'CNC_Simulator': '.cnc_controller',
+    'PlateLoader': '.plate_loader',
+    'SolidDoser': '.solid_doser',
+}
+
+# Raspberry Pi controllers resolve to None (with a warning) when unavailable
+_LEGACY_HARDWARE = {'PlateLoader', 'SolidDoser'}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    if name in _LEGACY_HARDWARE:
+        try:
+            value = getattr(importlib.import_module(module_name, __name__), name)
+        except Exception as e:
+            warnings.warn(f"Raspberry Pi hardware controllers not available: {e}", UserWarning)
+            value = None
+    else:
+        value = getattr(importlib.import_module(module_name, __name__), name)
+
+    # Cache so later lookups bypass __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,86 @@
+"""
+Once-only logging setup shared by the package scripts and examples.
+
+logging.basicConfig() silently does nothing when the root logger already has
+handlers, but still builds its arguments on every call. configure_once()
+checks a module-level flag first, so repeated calls (module re-imports,
+re-running scripts in Jupyter) cost nothing.
+
+The root logger only gets a QueueHandler; the real handlers (console, and
+any extra ones such as a FileHandler) run on a QueueListener thread. Records
+are queued unformatted, so %-formatting of the message also happens on the
+listener thread, and a log call in the dosing loop is just a queue put that
+never waits on terminal or disk I/O. Pass additional handlers to
+configure_once() rather than adding them to the root logger, so they are
+served by the listener too.
+"""
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Sequence
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the listener thread.
+
+    The stock prepare() formats the record on the logging thread so it can
+    be pickled; the queue here never leaves the process, so the record is
+    passed through as is. Log arguments must therefore not be mutated after
+    the call (the package only logs numbers and strings).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_configured = False
+_listener: Optional[QueueListener] = None
+
+
+def configure_once(level: int = logging.INFO, handlers: Sequence[logging.Handler] = ()):
+    """
+    Configure root logging with the package's standard format, once per process.
+
+    Args:
+        level: Root logger level (default INFO)
+        handlers: Extra handlers (e.g., logging.FileHandler) to serve from the
+                  background listener next to the console handler
+    """
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+
+    root = logging.getLogger()
+    if root.handlers:
+        # Logging already set up by the application; leave it alone, like
+        # logging.basicConfig() does
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    console = logging.StreamHandler()
+    targets = [console, *handlers]
+    for handler in targets:
+        if handler.formatter is None:
+            handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *targets, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)
+
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+
+
+def _stop_listener():
+    """Flush queued records and stop the listener thread (at exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,11 +1,15 @@
+import re
 import time
+import warnings
 import serial.tools.list_ports
-from threading import Event
+from collections import deque
+from threading import Condition, Event, Thread
 import matplotlib.pyplot as plt
-import math
 import yaml
 import os
 
+from .serial_utils import read_available
+
 
 def load_config(config_path, model_name):
     """Load configuration for a specific machine model"""
@@ -86,6 +90,16 @@ class CNC_Simulator:
 
 
 class CNC_Controller:
+    # Size of Grbl's serial receive buffer in bytes
+    RX_BUFFER_SIZE = 127
+    # select() interval while waiting for a reply line, in seconds
+    POLL_INTERVAL = 0.005
+    # Maximum wait for a reply to a '?' status query, in seconds
+    STATUS_TIMEOUT = 1.0
+    # Maximum wait for the next 'ok'/'error' while streaming, in seconds
+    # (generous, since Grbl holds back 'ok' while its planner is full)
+    STREAM_TIMEOUT = 30.0
+
     def __init__(self, port, config):
         ctrl_config = config['controller']
         self.BAUD_RATE = ctrl_config['baud_rate']
@@ -99,43 +113,145 @@ class CNC_Controller:
         self.X_OFFSET = ctrl_config['x_offset']
         self.Y_OFFSET = ctrl_config['y_offset']
         self.gcode = ""
+        self.ser = None
+        self._rx = bytearray()  # Received bytes not yet returned as a line
+
+    def connect(self):
+        """Open the serial connection (once) and wake up the controller"""
+        if self.ser is None or not self.ser.is_open:
+            self.ser = serial.Serial(self.SERIAL_PORT_PATH, self.BAUD_RATE)
+            self.wake_up(self.ser)
+        return self.ser
+
+    def disconnect(self):
+        """Close the serial connection"""
+        if self.ser is not None and self.ser.is_open:
+            self.ser.close()
+        self.ser = None
+        self._rx.clear()
+
+    def _reset_input(self, ser):
+        """Discard pending input, including bytes buffered by _readline()"""
+        ser.reset_input_buffer()
+        self._rx.clear()
+
+    def _readline(self, ser, timeout=None):
+        """
+        Read one reply line from Grbl without a blocking readline().
+
+        The port is polled with select() in POLL_INTERVAL steps and whatever
+        has arrived is appended to a buffer until a newline is seen; bytes
+        after the newline are kept for the next call.
+
+        Args:
+            ser: Open serial.Serial instance
+            timeout: Maximum time to wait in seconds (default: ser.timeout,
+                     None waits indefinitely)
+
+        Returns:
+            The line including its newline, or the partial data received
+            (possibly b"") if the timeout expired first
+        """
+        if timeout is None:
+            timeout = ser.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            end = self._rx.find(b"\n")
+            if end >= 0:
+                line = bytes(self._rx[:end + 1])
+                del self._rx[:end + 1]
+                return line
+            if deadline is None:
+                wait = self.POLL_INTERVAL
+            else:
+                wait = min(self.POLL_INTERVAL, deadline - time.monotonic())
+                if wait <= 0:
+                    line = bytes(self._rx)
+                    self._rx.clear()
+                    return line
+            self._rx += read_available(ser, wait)
 
     def home_xyz(self):
         """Home all axes using machine's homing cycle"""
-        with serial.Serial(self.SERIAL_PORT_PATH, self.BAUD_RATE) as ser:
-            self.wake_up(ser)
-            # Send homing command (Grbl-specific: $H)
-            ser.write(b"$H\n")
-            self.wait_for_movement_completion(ser, "$H")
-            print("Homing completed")
+        ser = self.connect()
+        # Send homing command (Grbl-specific: $H)
+        ser.write(b"$H\n")
+        self.wait_for_movement_completion(ser, "$H")
+        print("Homing completed")
 
     def read_coordinates(self):
-        """Read current machine coordinates"""
-        with serial.Serial(self.SERIAL_PORT_PATH, self.BAUD_RATE) as ser:
-            self.wake_up(ser)
-            ser.reset_input_buffer()
-            ser.write(b"?\n")
-            time.sleep(0.1)  # Wait for response
-            response = ser.readline().decode().strip()
-
-            # Parse position from response (format: <...|MPos:x,y,z|...>)
-            if 'MPos:' in response:
-                mpos_start = response.find('MPos:') + 5
-                mpos_end = response.find('|', mpos_start)
-                coordinates = list(map(float, response[mpos_start:mpos_end].split(',')))
-                return {'X': coordinates[0], 'Y': coordinates[1], 'Z': coordinates[2]}
+        """Read current machine coordinates (None if Grbl does not answer)"""
+        ser = self.connect()
+        self._reset_input(ser)
+        ser.write(b"?\n")
+        response = self._readline(ser, self.STATUS_TIMEOUT).decode(errors='replace').strip()
+        status = self._parse_status(response)
+        if status is None or not isinstance(status.get('MPos'), tuple):
+            return None
+        x, y, z = status['MPos'][:3]
+        return {'X': x, 'Y': y, 'Z': z}
+
+    def get_status(self, timeout=None):
+        """
+        Query Grbl's real-time status report.
+
+        Returns a dict with the machine state (e.g. 'Idle', 'Run', 'Alarm')
+        under 'state' plus the numeric report fields, e.g.
+        {'state': 'Idle', 'MPos': (0.0, 0.0, 0.0), 'FS': (0.0, 0.0)},
+        or None if no status report was received within timeout seconds
+        (default STATUS_TIMEOUT; the port itself is opened without one).
+        """
+        if timeout is None:
+            timeout = self.STATUS_TIMEOUT
+        ser = self.connect()
+        self._reset_input(ser)
+        ser.write(b"?")
+        response = self._readline(ser, timeout).decode(errors='replace').strip()
+        return self._parse_status(response)
+
+    @staticmethod
+    def _parse_status(response):
+        """
+        Parse a status report line into the dict returned by get_status().
+
+        Handles Grbl 1.1 reports (<Idle|MPos:0.000,0.000,0.000|FS:0,0>) and
+        Grbl 0.9 reports, where fields and their values are all separated
+        by commas (<Idle,MPos:0.000,0.000,0.000,WPos:0.000,0.000,0.000>).
+        A comma-separated part without a 'key:' continues the previous
+        field. Returns None if the line is not a status report.
+        """
+        if not (response.startswith('<') and response.endswith('>')):
             return None
 
+        state, *parts = re.split(r'[|,]', response[1:-1])
+        fields = {}
+        key = None
+        for part in parts:
+            if ':' in part:
+                key, _, value = part.partition(':')
+                fields[key] = [value]
+            elif key is not None:
+                fields[key].append(part)
+
+        status = {'state': state.split(':')[0]}
+        for key, values in fields.items():
+            try:
+                status[key] = tuple(float(v) for v in values)
+            except ValueError:
+                status[key] = ','.join(values)
+        return status
+
     def wait_for_movement_completion(self, ser, cleaned_line):
         Event().wait(1)
         if cleaned_line != '$X' or '$$':
             idle_counter = 0
             while True:
-                ser.reset_input_buffer()
+                self._reset_input(ser)
                 command = str.encode('?' + '\n')
                 ser.write(command)
-                grbl_out = ser.readline()
-                grbl_response = grbl_out.strip().decode('utf-8')
+                # A lost reply only costs a re-poll instead of blocking forever
+                grbl_out = self._readline(ser, self.STATUS_TIMEOUT)
+                grbl_response = grbl_out.strip().decode('utf-8', errors='replace')
                 if grbl_response != 'ok':
                     if 'Idle' in grbl_response:
                         idle_counter += 1
@@ -158,6 +274,27 @@ class CNC_Controller:
         else:
             print(f"Cannot move to {x}, {y}, coordinates not within bounds")
 
+    def format_move(self, x, y):
+        """
+        Build the G-code bytes for a rapid XY move (offsets applied).
+
+        The result can be cached and sent repeatedly with write_raw().
+        Raises ValueError if the point is outside the machine bounds.
+        """
+        if not self.coordinates_within_bounds(x, y):
+            raise ValueError(f"Cannot move to {x}, {y}, coordinates not within bounds")
+        return f"G0 X{x + self.X_OFFSET:.3f} Y{y + self.Y_OFFSET:.3f}\n".encode()
+
+    def write_raw(self, data):
+        """
+        Send a preformatted G-code line and wait until the move has finished.
+
+        Uses the persistent connection, so no port open or wake-up per call.
+        """
+        ser = self.connect()
+        ser.write(data)
+        self.wait_for_movement_completion(ser, data)
+
     def coordinates_within_bounds(self, x, y):
         return (
             self.X_LOW_BOUND <= x <= self.X_HIGH_BOUND and
@@ -170,21 +307,115 @@ class CNC_Controller:
         ser.flushInput()
         print("CNC machine is active")
 
-    def execute_movement(self, buffer=20):
-        """Execute accumulated G-code movements on the CNC machine"""
-        with serial.Serial(self.SERIAL_PORT_PATH, self.BAUD_RATE) as ser:
-            self.wake_up(ser)
-            out_strings = []
-            commands = self.gcode.split('\n')
-            for i in range(math.ceil(len(commands) / buffer)):
-                buffered_commands = commands[i*buffer:(i+1)*buffer]
-                buffered_gcode = "\n".join(buffered_commands) + "\n"
-                ser.write(str.encode(buffered_gcode))
-                self.wait_for_movement_completion(ser, buffered_gcode)
-                grbl_out = ser.readline()
-                out_strings.append(grbl_out.strip().decode('utf-8'))
-            self.gcode = ""  # Clear the gcode buffer after execution
-            return out_strings
+    def stream_gcode(self, ser, lines, timeout=None):
+        """
+        Stream G-code lines using Grbl's character-counting protocol.
+
+        A new line is sent as soon as the bytes still awaiting an 'ok'/'error'
+        plus the new line fit in Grbl's RX buffer, so the planner stays full
+        instead of the sender waiting for a reply after every line. Replies
+        are consumed by a reader thread (polling the port with select()), so
+        the writer never blocks on a read.
+
+        Lines may be str or bytes. Returns the list of 'ok'/'error'
+        responses, one per line sent. Raises TimeoutError if no reply
+        arrives for timeout seconds (default STREAM_TIMEOUT) while lines
+        are waiting for one, e.g. after a lost 'ok' or a dropped connection.
+        """
+        if timeout is None:
+            timeout = self.STREAM_TIMEOUT
+        in_flight = deque()  # Lengths of sent lines not yet acknowledged
+        in_flight_bytes = 0
+        responses = []
+        cond = Condition()
+        stop = Event()
+        reader_error = []
+
+        def reader():
+            nonlocal in_flight_bytes
+            buf = b""
+            try:
+                while not stop.is_set():
+                    buf += read_available(ser, 0.05)
+                    *replies, buf = buf.split(b"\n")
+                    for raw in replies:
+                        response = raw.strip().decode('utf-8', errors='replace')
+                        if response == 'ok' or response.startswith('error'):
+                            with cond:
+                                # Ignore replies to commands sent before streaming
+                                if not in_flight:
+                                    continue
+                                in_flight_bytes -= in_flight.popleft()
+                                responses.append(response)
+                                cond.notify_all()
+            except Exception as e:
+                with cond:
+                    reader_error.append(e)
+                    cond.notify_all()
+
+        def wait_until(predicate):
+            # Caller holds cond; the deadline restarts whenever a reply arrives
+            deadline = time.monotonic() + timeout
+            replies_seen = len(responses)
+            while not predicate():
+                if reader_error:
+                    raise reader_error[0]
+                if len(responses) != replies_seen:
+                    replies_seen = len(responses)
+                    deadline = time.monotonic() + timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"No reply from Grbl within {timeout}s "
+                        f"({len(in_flight)} lines unacknowledged)"
+                    )
+                cond.wait(remaining)
+
+        thread = Thread(target=reader, daemon=True)
+        thread.start()
+        try:
+            for line in lines:
+                data = line.strip() if isinstance(line, bytes) else line.strip().encode()
+                if not data:
+                    continue
+                data += b'\n'
+                with cond:
+                    wait_until(lambda: not in_flight or
+                               in_flight_bytes + len(data) <= self.RX_BUFFER_SIZE)
+                    in_flight.append(len(data))
+                    in_flight_bytes += len(data)
+                ser.write(data)
+
+            with cond:
+                wait_until(lambda: not in_flight)
+        finally:
+            stop.set()
+            thread.join()
+        return responses
+
+    def stream(self, lines):
+        """Stream G-code lines (str or bytes) over the persistent connection"""
+        return self.stream_gcode(self.connect(), lines)
+
+    def execute_movement(self, buffer=None):
+        """
+        Execute accumulated G-code movements on the CNC machine.
+
+        The buffer argument is deprecated and ignored: lines are streamed with
+        Grbl's character-counting protocol (see stream_gcode) instead of in
+        fixed-size batches.
+        """
+        if buffer is not None:
+            warnings.warn(
+                "execute_movement(buffer=...) is deprecated and ignored; "
+                "G-code is streamed by Grbl's RX buffer size",
+                DeprecationWarning, stacklevel=2
+            )
+        ser = self.connect()
+        out_strings = self.stream_gcode(ser, self.gcode.split('\n'))
+        self.wait_for_movement_completion(ser, self.gcode)
+        self.gcode = ""  # Clear the gcode buffer after execution
+        return out_strings
 
 if __name__ == "__main__":
     """
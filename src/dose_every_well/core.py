@@ -39,16 +39,47 @@ Usage:
     doser.shutdown()
 """
 
+import time
 import logging
-from typing import Optional, Dict, Any
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from statistics import fmean
+from typing import Optional, Dict, Any, List, NamedTuple
 from pathlib import Path
 
-from matterlab_balances import SartoriusBalance
-from .plate_loader import PlateLoader
+import numpy as np
+
+from ._logconfig import configure_once
+from .planning import nearest_neighbor_order, tour_length
+from .serial_utils import tune_serial_latency
 
 logger = logging.getLogger(__name__)
 
 
+class DoseResult(NamedTuple):
+    """
+    Result of dosing a single well.
+    
+    Masses are in milligrams. The measured fields are None when the dose was
+    not verified with the balance. Fields can also be read by name, e.g.
+    result['actual_mg'], and _asdict() returns a plain dictionary.
+    """
+    well: str
+    target_mg: float
+    initial_mg: Optional[float] = None
+    final_mg: Optional[float] = None
+    actual_mg: Optional[float] = None
+    error_mg: Optional[float] = None
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+
 class MicroDoser:
     """
     High-level orchestrator for precision weighing and plate handling.
@@ -64,6 +95,32 @@ class MicroDoser:
     with or without automated dispensing.
     """
     
+    __slots__ = (
+        'balance', 'loader', 'dosing_system',
+        '_ports', '_last_xy', '_motion_lock',
+        '_plate_loaded', '_last_tare_ts',
+        '_loader_has_status', '_status_cache', '_status_dirty',
+        '_loader_status', '_loader_status_ts',
+    )
+    
+    # Minimum interval between loader status polls in get_status() (seconds)
+    LOADER_STATUS_TTL = 0.1
+    
+    # load_plate() skips taring if the balance was tared less than
+    # TARE_MAX_AGE seconds ago and still reads within TARE_TOLERANCE_G of zero
+    TARE_TOLERANCE_G = 0.0005
+    TARE_MAX_AGE = 60.0
+    
+    # Balance readings averaged per read_balance() call
+    FULL_SAMPLES = 16  # Final/verification readings
+    FAST_SAMPLES = 4   # Coarse readings (e.g., initial mass before dosing)
+    
+    # Adaptive sampling for read_balance(stable=True): stop once the last
+    # STABLE_WINDOW readings have a coefficient of variation below STABLE_TAU
+    STABLE_WINDOW = 4
+    STABLE_TAU = 0.08
+    STABLE_MAX_SAMPLES = 12
+    
     def __init__(
         self,
         balance_port: str = '/dev/ttyUSB1',
@@ -82,39 +139,84 @@ class MicroDoser:
         """
         logger.info("Initializing MicroDoser...")
         
+        # Hardware drivers are imported on first use to keep package import cheap
+        from .sartorius_balance import SartoriusBalance
+        from .plate_loader import PlateLoader
+        
+        # Open serial connections, one per physical port
+        self._ports = {}
+        
         # Initialize balance
-        logger.info(f"Connecting to balance on {balance_port}...")
-        self.balance = SartoriusBalance(com_port=balance_port)
+        logger.info("Connecting to balance on %s...", balance_port)
+        self.balance = SartoriusBalance(
+            com_port=balance_port,
+            ser=self._get_or_open_balance_port(balance_port)
+        )
         
         # Initialize plate loader
-        logger.info(f"Initializing plate loader (plate type: {plate_type})...")
+        logger.info("Initializing plate loader (plate type: %s)...", plate_type)
         loader_params = plate_loader_params or {}
         self.loader = PlateLoader(plate_type=plate_type, **loader_params)
         
         # Optional dosing system
         self.dosing_system = dosing_system
         if self.dosing_system:
-            logger.info(f"Dosing system connected: {type(dosing_system).__name__}")
+            logger.info("Dosing system connected: %s", type(dosing_system).__name__)
         else:
             logger.info("No dosing system connected (weighing station mode)")
         
+        # Last known dosing head position, used to root the dose_plate() tour
+        self._last_xy = None
+        
+        # Serializes dosing system commands issued from the dose_plate pipeline
+        self._motion_lock = threading.Lock()
+        
         # State tracking
         self._plate_loaded = False
+        self._last_tare_ts = None
+        
+        # get_status() cache, rebuilt only after a state change
+        self._loader_has_status = hasattr(self.loader, 'get_status')
+        self._status_cache = {}
+        self._status_dirty = True
+        self._loader_status = 'unknown'
+        self._loader_status_ts = None
         
         logger.info("MicroDoser initialized successfully")
     
+    def _get_or_open_balance_port(self, port: str):
+        """
+        Get the balance's serial connection, opening it on first use.
+        
+        The port is opened with the balance's interface settings
+        (SartoriusBalance.open_port()). Connections are kept open for the
+        lifetime of the MicroDoser and closed once in shutdown().
+        """
+        from .sartorius_balance import SartoriusBalance
+        
+        ser = self._ports.get(port)
+        if ser is None or not ser.is_open:
+            ser = SartoriusBalance.open_port(port)
+            tune_serial_latency(port, ser)
+            self._ports[port] = ser
+        return ser
+    
     def load_plate(self):
         """
         Load plate onto the balance using automated loader.
-        Automatically tares balance after loading.
+        Automatically tares balance after loading, unless it was tared
+        recently and still reads zero.
         """
         logger.info("Loading plate...")
         self.loader.load_plate()
         self._plate_loaded = True
+        self._mark_status_stale()
         
         # Tare balance with empty plate
-        logger.info("Taring balance...")
-        self.balance.tare()
+        if self._tare_is_fresh():
+            logger.info("Balance already at zero, skipping tare")
+        else:
+            self.tare_balance()
         
         logger.info("Plate loaded and balance tared")
     
@@ -123,23 +225,75 @@ class MicroDoser:
         logger.info("Unloading plate...")
         self.loader.unload_plate()
         self._plate_loaded = False
+        self._mark_status_stale()
         logger.info("Plate unloaded")
     
-    def read_balance(self) -> float:
+    def read_balance(self, fast: bool = False, stable: bool = True) -> float:
         """
         Read current balance reading.
         
+        Args:
+            fast: If True, use fewer readings (FAST_SAMPLES) for a quicker,
+                  coarser result
+            stable: If True, sample adaptively and return as soon as the
+                    readings are stable (up to STABLE_MAX_SAMPLES). If False,
+                    average a fixed number of readings (FULL_SAMPLES), e.g.
+                    for calibration
+        
         Returns:
             Mass in grams
         """
-        mass = self.balance.weigh()
-        logger.debug(f"Balance reading: {mass:.4f} g")
+        if stable:
+            if fast:
+                mass = self._read_stable(self.FAST_SAMPLES, warn=False)
+            else:
+                mass = self._read_stable(self.STABLE_MAX_SAMPLES)
+        else:
+            self.balance.set_samples(self.FAST_SAMPLES if fast else self.FULL_SAMPLES)
+            mass = self.balance.weigh()
+        logger.debug("Balance reading: %.4f g", mass)
         return mass
     
+    def _read_stable(self, max_samples: int, warn: bool = True) -> float:
+        """
+        Average single readings until a window of them is stable.
+        
+        Settled means the window passes the coefficient-of-variation test
+        and the balance flags its latest reading as stable. If that does not
+        happen within max_samples readings, the unsettled mean is returned
+        and, with warn=True, a warning is logged.
+        """
+        from .sartorius_balance import is_stable
+        
+        window = deque(maxlen=self.STABLE_WINDOW)
+        for _ in range(max_samples):
+            mass, balance_stable = self.balance.read_reading()
+            window.append(mass)
+            if (balance_stable and len(window) == self.STABLE_WINDOW
+                    and is_stable(window, self.STABLE_TAU)):
+                return fmean(window)
+        
+        mean = fmean(window)
+        if warn:
+            logger.warning(
+                "Balance did not settle within %d readings, using unsettled mean %.4f g",
+                max_samples, mean
+            )
+        return mean
+    
     def tare_balance(self):
         """Tare the balance (zero the reading)."""
         logger.info("Taring balance...")
         self.balance.tare()
+        self._last_tare_ts = time.monotonic()
+    
+    def _tare_is_fresh(self) -> bool:
+        """Check whether the last tare is recent and the balance still reads zero."""
+        if self._last_tare_ts is None:
+            return False
+        if time.monotonic() - self._last_tare_ts >= self.TARE_MAX_AGE:
+            return False
+        return abs(self.read_balance(fast=True)) < self.TARE_TOLERANCE_G
     
     def weigh_well(self, well: str) -> float:
         """
@@ -154,28 +308,68 @@ class MicroDoser:
         Returns:
             Mass reading in grams
         """
-        logger.info(f"Weighing well {well}...")
+        self._check_well(well)
+        logger.info("Weighing well %s...", well)
         
         if self.dosing_system:
             # Use dosing system to position
-            self.dosing_system.position_at_well(well)
+            self._position_at_well(well)
         else:
             # Manual positioning
             print(f"\n⚠️  Position measurement device over well {well}")
             input("Press Enter when ready...")
         
         mass = self.read_balance()
-        logger.info(f"Well {well}: {mass:.4f} g")
+        logger.info("Well %s: %.4f g", well, mass)
         
         return mass
     
+    def _position_at_well(self, well: str):
+        """Position dosing system over a well."""
+        self._mark_status_stale()
+        with self._motion_lock:
+            self.dosing_system.position_at_well(well)
+            self._last_xy = self._well_xy(well)
+    
+    def _well_xy(self, well: str):
+        """
+        XY coordinates of a well from the dosing system, or None if unknown.
+        
+        Looked up on every use (the dosing system caches them), so changes
+        to its plate geometry are always picked up.
+        """
+        well_xy = getattr(self.dosing_system, 'well_xy', None)
+        return well_xy(well) if well_xy is not None else None
+    
+    def _check_well(self, well: str):
+        """
+        Raise ValueError if well is not a valid well identifier.
+        
+        Uses the dosing system's is_valid_well() when it has one, so wells
+        are accepted here exactly when the dosing system can reach them.
+        Without one (standalone weighing, other dosing systems) any label is
+        accepted, since the plate format is not known here.
+        """
+        is_valid = getattr(self.dosing_system, 'is_valid_well', None)
+        if is_valid is not None and not is_valid(well):
+            raise ValueError(f"Invalid well identifier: {well!r}")
+    
+    def _require_dosing_system(self):
+        """Raise RuntimeError if no dosing system is connected."""
+        if not self.dosing_system:
+            raise RuntimeError(
+                "No dosing system connected. "
+                "Initialize MicroDoser with dosing_system parameter "
+                "(e.g., dosing_system=CNCDosingSystem(...))"
+            )
+    
     def dose_to_well(
         self,
         well: str,
         target_mg: float,
         verify: bool = True,
         **kwargs
-    ) -> Dict[str, Any]:
+    ) -> DoseResult:
         """
         Dose material to a well with gravimetric feedback.
         
@@ -188,84 +382,243 @@ class MicroDoser:
             **kwargs: Additional parameters passed to dosing system
         
         Returns:
-            Dictionary with dosing results:
-            {
-                'well': str,
-                'target_mg': float,
-                'initial_mg': float (if verify=True),
-                'final_mg': float (if verify=True),
-                'actual_mg': float (if verify=True),
-                'error_mg': float (if verify=True)
-            }
+            DoseResult with well, target_mg and, if verify=True, initial_mg,
+            final_mg, actual_mg and error_mg (otherwise None)
         
         Raises:
             RuntimeError: If no dosing system is connected
         """
-        if not self.dosing_system:
-            raise RuntimeError(
-                "No dosing system connected. "
-                "Initialize MicroDoser with dosing_system parameter "
-                "(e.g., dosing_system=CNCDosingSystem(...))"
-            )
+        self._require_dosing_system()
         
-        logger.info(f"Dosing {target_mg:.2f} mg to well {well}...")
+        logger.info("Dosing %.2f mg to well %s...", target_mg, well)
         
-        result = {
-            'well': well,
-            'target_mg': target_mg
-        }
+        if not verify:
+            self._dispense(well, target_mg, **kwargs)
+            return DoseResult(well, target_mg)
         
-        # Measure initial mass (if verification enabled)
-        if verify:
-            initial_mg = self.read_balance() * 1000  # g to mg
-            result['initial_mg'] = initial_mg
-            logger.info(f"Initial mass: {initial_mg:.3f} mg")
+        # Measure initial mass (coarse reading is enough for the baseline)
+        initial_mg = self.read_balance(fast=True) * 1000  # g to mg
+        logger.info("Initial mass: %.3f mg", initial_mg)
         
         # Dose using external system
-        self.dosing_system.dose_to_well(well, target_mg=target_mg, **kwargs)
+        self._dispense(well, target_mg, **kwargs)
         
-        # Measure final mass (if verification enabled)
-        if verify:
-            final_mg = self.read_balance() * 1000  # g to mg
-            actual_mg = final_mg - initial_mg
-            error_mg = actual_mg - target_mg
-            
-            result['final_mg'] = final_mg
-            result['actual_mg'] = actual_mg
-            result['error_mg'] = error_mg
-            
-            logger.info(f"Final mass: {final_mg:.3f} mg")
-            logger.info(f"Actual dispensed: {actual_mg:.3f} mg")
-            logger.info(f"Error: {error_mg:.3f} mg ({error_mg/target_mg*100:.1f}%)")
+        # Measure final mass
+        final_mg = self.read_balance() * 1000  # g to mg
+        
+        return self._dose_result(well, target_mg, initial_mg, final_mg)
+    
+    def _dispense(
+        self,
+        well: str,
+        target_mg: float,
+        move: Optional[Future] = None,
+        check: bool = True,
+        **kwargs
+    ):
+        """
+        Dose to a well through the dosing system, holding the motion lock.
+        
+        check=False skips the well validation for callers that validated
+        the whole batch up front (dose_plate()).
         
-        return result
+        move is a prefetched move to this well still running on the
+        dose_plate() pipeline. Dosing systems that can dispense in place
+        (dispense()) then spin up while it finishes and skip their own move;
+        the move holds the motion lock itself, so it is not taken here.
+        Others wait for the move and dose as usual.
+        """
+        if check:
+            self._check_well(well)
+        self._mark_status_stale()
+        if move is not None and hasattr(self.dosing_system, 'dispense'):
+            self.dosing_system.dispense(target_mg, wait=move.result, **kwargs)
+            return
+        if move is not None:
+            move.result()
+        with self._motion_lock:
+            self.dosing_system.dose_to_well(well, target_mg=target_mg, **kwargs)
+            self._last_xy = self._well_xy(well)
+    
+    def _dose_result(
+        self,
+        well: str,
+        target_mg: float,
+        initial_mg: float,
+        final_mg: float
+    ) -> DoseResult:
+        """Build and log the result of a verified dose."""
+        self._log_dose(target_mg, initial_mg, final_mg)
+        actual_mg = final_mg - initial_mg
+        
+        return DoseResult(
+            well, target_mg, initial_mg, final_mg, actual_mg, actual_mg - target_mg
+        )
+    
+    @staticmethod
+    def _log_dose(target_mg: float, initial_mg: float, final_mg: float):
+        """Log final mass, dispensed mass and error of a verified dose."""
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        actual_mg = final_mg - initial_mg
+        error_mg = actual_mg - target_mg
+        logger.info("Final mass: %.3f mg", final_mg)
+        logger.info("Actual dispensed: %.3f mg", actual_mg)
+        logger.info("Error: %.3f mg (%.1f%%)", error_mg, error_mg / target_mg * 100)
     
     def dose_plate(
         self,
         well_targets: Dict[str, float],
-        verify: bool = True
-    ) -> Dict[str, Dict[str, Any]]:
+        verify: bool = True,
+        as_arrays: bool = False,
+        optimize_order: bool = True,
+        verify_total: bool = False
+    ) -> Dict[str, Any]:
         """
         Dose multiple wells in sequence.
         
+        With verification enabled, the move to the next well runs in the
+        background while the balance settles for the current well's final
+        reading, and that reading doubles as the next well's initial mass.
+        
         Args:
             well_targets: Dictionary mapping well IDs to target masses (mg)
                          Example: {'A1': 5.0, 'A2': 3.0, 'B1': 7.0}
             verify: If True, verifies each dose with balance
+            as_arrays: If True, return results as parallel NumPy arrays
+            optimize_order: If True, visit wells in a nearest-neighbor tour
+                            starting from the current head position to cut
+                            CNC travel; if False, dose in dictionary order.
+                            Results are in dictionary order either way.
+            verify_total: With verify=False, weigh the plate once before and
+                          once after dosing and log the total dispensed
+                          against the total target (2 readings instead
+                          of 2 per well)
         
         Returns:
-            Dictionary mapping well IDs to result dictionaries
+            Dictionary mapping well IDs to DoseResult, or if as_arrays=True,
+            a dictionary of equal-length arrays with keys 'well',
+            'target_mg', 'initial_mg', 'final_mg', 'actual_mg', 'error_mg'
+            and 'error_pct' (NaN where not verified)
         """
-        logger.info(f"Dosing {len(well_targets)} wells...")
+        self._require_dosing_system()
         
-        results = {}
-        for well, target_mg in well_targets.items():
-            result = self.dose_to_well(well, target_mg, verify=verify)
-            results[well] = result
+        # Reject malformed wells before anything is dispensed
+        for well in well_targets:
+            self._check_well(well)
         
-        logger.info(f"Plate dosing complete: {len(results)} wells")
+        wells = list(well_targets)
+        n_wells = len(wells)
+        targets = np.fromiter(well_targets.values(), dtype=float, count=n_wells)
+        initial = np.full(n_wells, np.nan)
+        final = np.full(n_wells, np.nan)
         
-        return results
+        logger.info("Dosing %d wells...", n_wells)
+        
+        order = self._dose_order(wells) if optimize_order else np.arange(n_wells)
+        
+        if verify and wells:
+            self._dose_plate_pipelined(wells, targets, initial, final, order)
+        else:
+            # Wells were validated above, so dispense directly with no reads
+            start_mg = self.read_balance(fast=True) * 1000 if verify_total else None
+            for i in order.tolist():
+                logger.info("Dosing %.2f mg to well %s...", targets[i], wells[i])
+                self._dispense(wells[i], float(targets[i]), check=False)
+            if verify_total:
+                total_mg = self.read_balance() * 1000 - start_mg
+                target_total_mg = float(targets.sum())
+                logger.info(
+                    "Plate total: %.3f mg dispensed, %.3f mg target (error %.3f mg)",
+                    total_mg, target_total_mg, total_mg - target_total_mg
+                )
+        
+        logger.info("Plate dosing complete: %d wells", n_wells)
+        
+        actual = final - initial
+        errors = actual - targets
+        
+        if as_arrays:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                error_pct = errors / targets * 100
+            return {
+                'well': np.array(wells),
+                'target_mg': targets,
+                'initial_mg': initial,
+                'final_mg': final,
+                'actual_mg': actual,
+                'error_mg': errors,
+                'error_pct': error_pct
+            }
+        
+        if not verify:
+            return {well: DoseResult(well, well_targets[well]) for well in wells}
+        
+        return {
+            well: DoseResult(well, well_targets[well], i_mg, f_mg, a_mg, e_mg)
+            for well, i_mg, f_mg, a_mg, e_mg in zip(
+                wells, initial.tolist(), final.tolist(), actual.tolist(), errors.tolist()
+            )
+        }
+    
+    def _dose_order(self, wells: List[str]) -> np.ndarray:
+        """
+        Nearest-neighbor visiting order for wells, rooted at the head position.
+        
+        Falls back to the given order when well coordinates are unknown.
+        """
+        if len(wells) < 3:
+            return np.arange(len(wells))
+        coords = [self._well_xy(well) for well in wells]
+        if None in coords:
+            return np.arange(len(wells))
+        
+        xy = np.array(coords, dtype=float)
+        order = nearest_neighbor_order(xy, start=self._last_xy)
+        logger.info(
+            "Optimized well order: %.1f mm travel (was %.1f mm)",
+            tour_length(xy, order), tour_length(xy, np.arange(len(wells)))
+        )
+        return order
+    
+    def _dose_plate_pipelined(
+        self,
+        wells: List[str],
+        targets: np.ndarray,
+        initial: np.ndarray,
+        final: np.ndarray,
+        order: np.ndarray
+    ):
+        """
+        Verified plate dosing with the next move overlapping the final read.
+        
+        Wells are visited in the given order (indices into wells) and must
+        already be validated. Fills the initial and final mass arrays (mg)
+        in place.
+        """
+        initial_mg = self.read_balance(fast=True) * 1000  # g to mg
+        logger.info("Initial mass: %.3f mg", initial_mg)
+        
+        order = order.tolist()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            move = None
+            for step, i in enumerate(order):
+                well = wells[i]
+                target_mg = float(targets[i])
+                logger.info("Dosing %.2f mg to well %s...", target_mg, well)
+                
+                # Dispense in place once the prefetched move is done
+                self._dispense(well, target_mg, move=move, check=False)
+                
+                # Start moving to the next well while the balance settles
+                if step + 1 < len(order):
+                    move = pool.submit(self._position_at_well, wells[order[step + 1]])
+                
+                final_mg = self.read_balance() * 1000  # g to mg
+                self._log_dose(target_mg, initial_mg, final_mg)
+                initial[i] = initial_mg
+                final[i] = final_mg
+                initial_mg = final_mg
     
     def home(self):
         """Return all components to home position."""
@@ -293,24 +646,52 @@ class MicroDoser:
         # Shutdown loader
         self.loader.shutdown()
         
-        # Balance doesn't need explicit shutdown (serial connection auto-closes)
+        # Stop any continuous monitoring before its port is closed
+        self.balance.close()
+        
+        # Close each serial port exactly once
+        for ser in self._ports.values():
+            if ser.is_open:
+                ser.close()
+        self._ports.clear()
+        
+        self._mark_status_stale()
         
         logger.info("MicroDoser shutdown complete")
     
+    def _mark_status_stale(self):
+        """Make the next get_status() rebuild its cache and poll the loader."""
+        self._status_dirty = True
+        self._loader_status_ts = None
+    
     def get_status(self) -> Dict[str, Any]:
         """
         Get current system status.
         
+        The status is cached between state changes (plate load/unload,
+        moves, dispenses, shutdown), and in between the loader is polled at
+        most once per LOADER_STATUS_TTL seconds, so high-rate polling stays
+        cheap.
+        
         Returns:
             Dictionary with status information
         """
-        status = {
-            'plate_loaded': self._plate_loaded,
-            'balance_connected': self.balance is not None,
-            'dosing_system_connected': self.dosing_system is not None,
-            'loader_status': self.loader.get_status() if hasattr(self.loader, 'get_status') else 'unknown'
-        }
+        if self._status_dirty:
+            self._status_cache = {
+                'plate_loaded': self._plate_loaded,
+                'balance_connected': self.balance is not None,
+                'dosing_system_connected': self.dosing_system is not None
+            }
+            self._status_dirty = False
+        
+        if self._loader_has_status:
+            now = time.monotonic()
+            if self._loader_status_ts is None or now - self._loader_status_ts >= self.LOADER_STATUS_TTL:
+                self._loader_status = self.loader.get_status()
+                self._loader_status_ts = now
         
+        status = dict(self._status_cache)
+        status['loader_status'] = self._loader_status
         return status
 
 
@@ -321,10 +702,7 @@ def main():
     print("Optional: CNC Dosing System")
     
     # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    configure_once()
     
     try:
         # Ask user for configuration
@@ -383,7 +761,7 @@ def main():
     except KeyboardInterrupt:
         print("\n\nInterrupted by user")
     except Exception as e:
-        logger.error(f"Error: {e}", exc_info=True)
+        logger.error("Error: %s", e, exc_info=True)
     finally:
         if 'doser' in locals():
             doser.shutdown()
@@ -4,14 +4,70 @@ CNC-based solid dosing system.
 Integrates CNC positioning with solid doser hardware.
 """
 
+import os
+import re
+import sys
+import json
+import asyncio
+import hashlib
 import logging
-from typing import Optional, Tuple
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
-from .cnc_controller import CNC_Controller
-from .solid_doser import SolidDoser
+import numpy as np
+
+from ._logconfig import configure_once
+from .planning import nearest_neighbor_order, serpentine_order
+from .serial_utils import tune_serial_latency
 
 logger = logging.getLogger(__name__)
 
+# Plate format -> (rows, columns, standard SBS well pitch in mm)
+_PLATE_SPECS = {
+    '96': (8, 12, 9.0),
+    '384': (16, 24, 4.5),
+    '1536': (32, 48, 2.25),
+}
+
+# Row labels: A-Z, then AA-AF for 1536-well plates
+_ROW_LABELS = [chr(ord('A') + i) for i in range(26)] + ['A' + chr(ord('A') + i) for i in range(6)]
+
+# Well ID (row letters + column number) and row label -> zero-based row index,
+# with both cases so parsing needs no .upper()
+_WELL_RE = re.compile(r"([A-Za-z]{1,2})([0-9]{1,2})$")
+_ROW_TABLE = {
+    c: i for i, row in enumerate(_ROW_LABELS) for c in (row, row.lower())
+}
+
+# Plate format -> every well ID on that plate (both cases), so a well can be
+# validated with one set lookup before it reaches the coordinate tables
+_VALID_WELLS = {
+    plate_format: frozenset(
+        label + str(c + 1)
+        for r in range(rows) for c in range(cols)
+        for label in (_ROW_LABELS[r], _ROW_LABELS[r].lower())
+    )
+    for plate_format, (rows, cols, _) in _PLATE_SPECS.items()
+}
+
+
+@lru_cache(maxsize=1536)
+def _parse_well(well: str) -> Tuple[int, int]:
+    """
+    Parse a well ID (e.g., 'B3') into zero-based (row, col) indices.
+    
+    Raises:
+        ValueError: If well is not a valid well identifier
+    """
+    m = _WELL_RE.match(well)
+    row = _ROW_TABLE.get(m.group(1)) if m else None
+    if row is None:
+        raise ValueError(f"Invalid well identifier: {well!r}")
+    return row, int(m.group(2)) - 1
+
 
 class CNCDosingSystem:
     """
@@ -31,12 +87,19 @@ class CNCDosingSystem:
         dosing.shutdown()
     """
     
+    # Where compile_plan() stores G-code plan files; None resolves to
+    # $XDG_CACHE_HOME/dose_every_well (default ~/.cache) on each call
+    PLAN_CACHE_DIR: Optional[Path] = None
+    
     def __init__(
         self,
         cnc_port: str,
         doser_params: Optional[dict] = None,
-        well_spacing: float = 9.0,
-        plate_origin: Tuple[float, float] = (0.0, 0.0)
+        well_spacing: Optional[float] = None,
+        plate_origin: Tuple[float, float] = (0.0, 0.0),
+        cnc_model: str = 'Genmitsu 4040 PRO',
+        flow_rate: float = 2.0,
+        calibration_path: Optional[Union[str, Path]] = None
     ):
         """
         Initialize CNC dosing system.
@@ -45,8 +108,18 @@ class CNCDosingSystem:
             cnc_port: Serial port for CNC controller (e.g., '/dev/ttyUSB0')
             doser_params: Parameters for SolidDoser initialization
                          Default: {'i2c_address': 0x40, 'motor_gpio_pin': 17}
-            well_spacing: Distance between wells in mm (default 9.0 for 96-well)
+            well_spacing: Distance between wells in mm for every plate format
+                          (default None = standard pitch of each format:
+                          9.0 mm for 96, 4.5 mm for 384, 2.25 mm for 1536)
             plate_origin: XY coordinates of well A1 (default 0, 0)
+            cnc_model: Machine entry in cnc_settings.yaml
+            flow_rate: Dispense flow rate in mg/s (default 2.0 is a rough
+                       estimate; measure it with calibrate_flow_rate())
+            calibration_path: Optional JSON file of measured (mass_mg,
+                              duration_s) points. When it has points,
+                              durations are interpolated from them instead
+                              of using flow_rate; calibrate_flow_rate()
+                              appends new points to it.
         """
         self.cnc_port = cnc_port
         self.doser_params = doser_params or {
@@ -54,31 +127,180 @@ class CNCDosingSystem:
             'motor_gpio_pin': 17,
             'frequency': 50
         }
-        self.well_spacing = well_spacing
-        self.plate_origin = plate_origin
+        self.cnc_model = cnc_model
+        self.flow_rate = flow_rate
+        
+        # Calibration table (mass_mg -> duration_s); None = use flow_rate
+        self.calibration_path = Path(calibration_path) if calibration_path else None
+        self._cal_points: List[Tuple[float, float]] = []
+        self._cal_mg: Optional[np.ndarray] = None
+        self._cal_dur: Optional[np.ndarray] = None
+        if self.calibration_path is not None and self.calibration_path.exists():
+            with open(self.calibration_path) as f:
+                points = json.load(f)['points']
+            self._set_calibration([(float(m), float(d)) for m, d in points])
         
         self.cnc = None
         self.doser = None
         
+        # True once the CNC is known to be homed; cleared when a move fails
+        self._homed = False
+        
+        # Start of an operator line read from stdin by _prompt(), kept when
+        # the prompt times out before the line is complete
+        self._stdin_buf = ''
+        
+        # Set through the properties below, which rebuild the coordinate
+        # tables and drop cached coordinates/G-code on change
+        self._well_spacing = well_spacing
+        self._plate_origin = tuple(plate_origin)
+        self._origin_arr = np.asarray(plate_origin, dtype=float)
+        self._reset_geometry()
+        
         logger.info("CNCDosingSystem configured")
-        logger.info(f"  CNC port: {cnc_port}")
-        logger.info(f"  Well spacing: {well_spacing} mm")
-        logger.info(f"  Plate origin: {plate_origin}")
+        logger.info("  CNC port: %s", cnc_port)
+        logger.info("  Well spacing: %s mm", well_spacing)
+        logger.info("  Plate origin: %s", plate_origin)
+    
+    @property
+    def flow_rate(self) -> float:
+        """Dispense flow rate in mg/s used to convert target mass to duration."""
+        return self._flow_rate
     
-    def initialize(self):
-        """Initialize CNC and solid doser hardware."""
+    @flow_rate.setter
+    def flow_rate(self, value: float):
+        if value <= 0:
+            raise ValueError(f"flow_rate must be positive, got {value}")
+        self._flow_rate = float(value)
+    
+    @property
+    def well_spacing(self) -> Optional[float]:
+        """Well pitch override in mm (None = standard pitch per plate format)."""
+        return self._well_spacing
+    
+    @well_spacing.setter
+    def well_spacing(self, value: Optional[float]):
+        self._well_spacing = value
+        self._reset_geometry()
+    
+    @property
+    def plate_origin(self) -> Tuple[float, float]:
+        """XY coordinates of well A1 in mm."""
+        return self._plate_origin
+    
+    @plate_origin.setter
+    def plate_origin(self, value: Tuple[float, float]):
+        self._plate_origin = tuple(value)
+        self._origin_arr = np.asarray(value, dtype=float)
+        self._reset_geometry()
+    
+    def add_calibration_point(self, mass_mg: float, duration_s: float, save: bool = True):
+        """
+        Add a measured (mass, duration) pair to the calibration table.
+        
+        Args:
+            mass_mg: Mass dispensed in milligrams
+            duration_s: Dispense duration that produced it in seconds
+            save: Write the updated table to calibration_path (if set)
+        """
+        if mass_mg <= 0 or duration_s <= 0:
+            raise ValueError("Calibration mass and duration must be positive")
+        self._set_calibration(self._cal_points + [(float(mass_mg), float(duration_s))])
+        if save and self.calibration_path is not None:
+            with open(self.calibration_path, 'w') as f:
+                json.dump({'points': self._cal_points}, f, indent=2)
+            logger.info("Saved %d calibration points to %s",
+                        len(self._cal_points), self.calibration_path)
+    
+    def _set_calibration(self, points: List[Tuple[float, float]]):
+        """Store calibration points and rebuild the interpolation table."""
+        self._cal_points = sorted(points)
+        if not self._cal_points:
+            self._cal_mg = self._cal_dur = None
+            return
+        # Anchor at (0, 0) so small targets scale down instead of being
+        # clamped to the smallest calibrated duration
+        table = np.array([(0.0, 0.0)] + self._cal_points)
+        self._cal_mg = table[:, 0]
+        self._cal_dur = table[:, 1]
+    
+    def _reset_geometry(self):
+        """Drop coordinate tables and caches derived from plate geometry."""
+        # plate_format -> (rows, cols, 2) array of well XY coordinates,
+        # built on first use of each format by _coord_table()
+        self._coord_tables: Dict[str, np.ndarray] = {}
+        
+        # (well, plate_format) -> (x, y) as Python floats, filled on first use
+        self._coord_cache: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        
+        # (well, plate_format) -> preformatted G-code move
+        self._gcode_cache: Dict[Tuple[str, str], bytes] = {}
+    
+    def initialize(self, plate_format: str = '96', force_home: bool = False):
+        """
+        Initialize CNC and solid doser hardware.
+        
+        Safe to call again (e.g., after a transient error): existing
+        connections are reused, and the CNC homing cycle is skipped if the
+        machine was already homed and reports Idle.
+        
+        Args:
+            plate_format: Plate format whose G-code moves are precomputed
+                          (wells outside the CNC bounds are skipped)
+            force_home: Always run the homing cycles
+        """
         logger.info("Initializing CNC Dosing System...")
         
+        # Hardware drivers are imported on first use to keep package import
+        # cheap, and not at all when the hardware is already set up
+        
         # Initialize CNC
-        self.cnc = CNC_Controller(port=self.cnc_port)
-        self.cnc.home()
+        if self.cnc is None:
+            from .cnc_controller import CNC_Controller, load_config
+            config = load_config("cnc_settings.yaml", self.cnc_model)
+            self.cnc = CNC_Controller(port=self.cnc_port, config=config)
+            # Cached moves embed the previous controller's offsets
+            self._gcode_cache.clear()
+        # Tuned on the open port so ASYNC_LOW_LATENCY is set as well
+        tune_serial_latency(self.cnc_port, self.cnc.connect())
+        
+        if force_home or not self._cnc_is_homed():
+            self.cnc.home_xyz()
+            self._homed = True
+        else:
+            logger.info("CNC already homed and idle, skipping homing cycle")
+        
+        # Precompute the move for every reachable well of the plate; wells
+        # outside the machine bounds only fail if they are actually dosed
+        unreachable = []
+        for well in self.well_coordinates(plate_format):
+            try:
+                self._gcode_for(well, plate_format)
+            except ValueError:
+                unreachable.append(well)
+        if unreachable:
+            logger.warning(
+                "%d wells of the %s-well plate are outside the CNC bounds: %s",
+                len(unreachable), plate_format, ", ".join(unreachable)
+            )
         
         # Initialize solid doser
-        self.doser = SolidDoser(**self.doser_params)
-        self.doser.home()
+        if self.doser is None:
+            from .solid_doser import SolidDoser
+            self.doser = SolidDoser(**self.doser_params)
+            self.doser.home()
+        elif force_home:
+            self.doser.home()
         
         logger.info("CNC Dosing System ready")
     
+    def _cnc_is_homed(self) -> bool:
+        """True if the CNC was homed by this system and still reports Idle."""
+        if not self._homed:
+            return False
+        status = self.cnc.get_status()
+        return status is not None and status['state'] == 'Idle'
+    
     def position_at_well(self, well: str, plate_format: str = '96'):
         """
         Move CNC to position over specified well.
@@ -87,9 +309,65 @@ class CNCDosingSystem:
             well: Well identifier (e.g., 'A1', 'B12')
             plate_format: Plate format ('96', '384', etc.)
         """
-        x, y = self._well_to_coords(well, plate_format)
-        logger.info(f"Positioning at well {well} -> ({x:.2f}, {y:.2f})")
-        self.cnc.move_to(x, y)
+        if logger.isEnabledFor(logging.INFO):
+            x, y = self._well_to_coords(well, plate_format)
+            logger.info("Positioning at well %s -> (%.2f, %.2f)", well, x, y)
+        gcode = self._gcode_for(well, plate_format)
+        try:
+            self.cnc.write_raw(gcode)
+        except BaseException:
+            # Position may be lost; make the next initialize() re-home
+            self._homed = False
+            raise
+    
+    def well_coordinates(self, plate_format: str = '96') -> Dict[str, Tuple[float, float]]:
+        """
+        Get XY coordinates of every well on a plate.
+        
+        Args:
+            plate_format: Plate format ('96', '384', '1536')
+        
+        Returns:
+            Dictionary mapping well IDs to (x, y) coordinates in mm
+        """
+        table = self._coord_table(plate_format)
+        rows, cols = table.shape[:2]
+        wells = [f"{_ROW_LABELS[r]}{c + 1}" for r in range(rows) for c in range(cols)]
+        return dict(zip(wells, map(tuple, table.reshape(-1, 2).tolist())))
+    
+    @staticmethod
+    def is_valid_well(well: str, plate_format: str = '96') -> bool:
+        """
+        Check whether a well ID exists on a plate format.
+        
+        Args:
+            well: Well identifier (e.g., 'A1'; zero-padded IDs like 'A01'
+                  are not accepted)
+            plate_format: Plate format ('96', '384', '1536')
+        
+        Returns:
+            True if the well is on the plate
+        """
+        return well in _VALID_WELLS.get(plate_format, ())
+    
+    def well_xy(self, well: str, plate_format: str = '96') -> Tuple[float, float]:
+        """
+        Get XY coordinates of a single well.
+        
+        Coordinates are cached per well and follow changes to well_spacing
+        and plate_origin.
+        
+        Args:
+            well: Well identifier (e.g., 'A1')
+            plate_format: Plate format ('96', '384', '1536')
+        
+        Returns:
+            (x, y) coordinates in mm
+        
+        Raises:
+            ValueError: If the well is not on the plate
+        """
+        return self._well_to_coords(well, plate_format)
     
     def dose_to_well(
         self,
@@ -107,58 +385,597 @@ class CNCDosingSystem:
             gate_position: Optional gate position override
             **kwargs: Additional parameters passed to doser.dispense()
         """
-        logger.info(f"Dosing {target_mg:.2f} mg to well {well}")
-        
-        # Position CNC
-        self.position_at_well(well)
+        logger.info("Dosing %.2f mg to well %s", target_mg, well)
         
         # Calculate dispense duration based on target
         duration = self._calculate_duration(target_mg)
         
-        # Dispense
-        self.doser.dispense(duration=duration, gate_position=gate_position, **kwargs)
+        # Spin up the motor (gate closed) while the CNC moves, then dispense
+        self._move_and_dispense(
+            lambda: self.position_at_well(well), duration, gate_position, **kwargs
+        )
         
-        logger.info(f"Dosing to {well} complete")
+        logger.info("Dosing to %s complete", well)
+    
+    def dispense(
+        self,
+        target_mg: float,
+        gate_position: Optional[float] = None,
+        wait: Optional[Callable[[], Any]] = None,
+        **kwargs
+    ):
+        """
+        Dispense solid material at the current CNC position (no move).
+        
+        For callers that already positioned the head, e.g. with
+        position_at_well(). A move still running in another thread can be
+        passed as wait: the motor spins up while it finishes, as in
+        dose_to_well(), and the gate only opens once wait() has returned.
+        
+        Args:
+            target_mg: Target mass in milligrams
+            gate_position: Optional gate position override
+            wait: Optional callable that blocks until the head is in place
+                  (e.g., the result() of a prefetched move)
+            **kwargs: Additional parameters passed to doser.dispense()
+        """
+        duration = self._calculate_duration(target_mg)
+        if wait is not None:
+            self._move_and_dispense(wait, duration, gate_position, **kwargs)
+        else:
+            self.doser.dispense(duration=duration, gate_position=gate_position, **kwargs)
+    
+    def _move_and_dispense(
+        self,
+        move,
+        duration: float,
+        gate_position: Optional[float] = None,
+        **kwargs
+    ):
+        """
+        Run a CNC move while the doser motor spins up, then dispense.
+        
+        The gate only opens after the move has finished, so no material is
+        dropped in transit; the overlap saves the motor startup delay per well.
+        Falls back to doser.dispense() for dosers without the split API or
+        when extra dispense parameters are given.
+        
+        Args:
+            move: Callable performing the (blocking) CNC move
+            duration: Dispensing time in seconds
+            gate_position: Optional gate position override
+            **kwargs: Additional parameters passed to doser.dispense()
+        """
+        try:
+            if kwargs or not hasattr(self.doser, 'trigger_dispense'):
+                move()
+                self.doser.dispense(duration=duration, gate_position=gate_position, **kwargs)
+                return
+            
+            spin_up = threading.Thread(target=self.doser.prepare_dispense, daemon=True)
+            spin_up.start()
+            try:
+                move()
+            except BaseException:
+                # Never leave the motor running if the move fails
+                spin_up.join()
+                self.doser.motor_off()
+                raise
+            spin_up.join()
+            self.doser.trigger_dispense(duration, gate_position)
+        except BaseException:
+            # Position may be lost; make the next initialize() re-home
+            self._homed = False
+            raise
+    
+    def dose_many(
+        self,
+        jobs: Sequence[Tuple[str, float]],
+        optimize: Optional[str] = 'nearest',
+        plate_format: str = '96',
+        gate_position: Optional[float] = None,
+        verbose: bool = False,
+        **kwargs
+    ) -> List[str]:
+        """
+        Dose a batch of wells, reordered to minimize CNC travel.
+        
+        Coordinates and dispense durations are computed for the whole batch
+        up front, so the per-well loop only moves and dispenses.
+        
+        Args:
+            jobs: Sequence of (well, target_mg) pairs
+            optimize: Visiting order: 'nearest' (greedy nearest-neighbor tour),
+                      'serpentine' (rows alternating direction) or None (as given)
+            plate_format: Plate format ('96', '384', '1536')
+            gate_position: Optional gate position override
+            verbose: If True, log every well and its coordinates (otherwise
+                     only the batch summary is logged)
+            **kwargs: Additional parameters passed to doser.dispense()
+        
+        Returns:
+            Well IDs in the order they were dosed
+        """
+        wells, masses, xy, durations, order = self._ordered_jobs(jobs, optimize, plate_format)
+        
+        logger.info("Dosing %d wells (order: %s)", len(wells), optimize or 'as given')
+        
+        for i in order:
+            if verbose:
+                logger.info(
+                    "Dosing %.2f mg to well %s -> (%.2f, %.2f)", masses[i], wells[i], *xy[i]
+                )
+            gcode = self._gcode_for(wells[i], plate_format)
+            self._move_and_dispense(
+                lambda: self.cnc.write_raw(gcode), float(durations[i]), gate_position, **kwargs
+            )
+        
+        return [wells[i] for i in order]
+    
+    def _ordered_jobs(
+        self,
+        jobs: Sequence[Tuple[str, float]],
+        optimize: Optional[str],
+        plate_format: str
+    ) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, List[int]]:
+        """
+        Plan a batch of (well, target_mg) jobs and choose the visiting order.
+        
+        Returns:
+            (wells, masses, xy, durations, order); order indexes the others
+        """
+        if optimize not in ('nearest', 'serpentine', None):
+            raise ValueError(f"Unknown optimize mode: {optimize!r}")
+        
+        wells = [well for well, _ in jobs]
+        masses = np.array([target_mg for _, target_mg in jobs], dtype=float)
+        rows, cols, xy, durations = self._plan_jobs(wells, masses, plate_format)
+        
+        if optimize == 'nearest' and wells:
+            order = nearest_neighbor_order(xy)
+        elif optimize == 'serpentine':
+            order = serpentine_order(rows, cols)
+        else:
+            order = np.arange(len(wells))
+        
+        return wells, masses, xy, durations, order.tolist()
+    
+    def compile_plan(
+        self,
+        plan_id: str,
+        jobs: Sequence[Tuple[str, float]],
+        optimize: Optional[str] = 'nearest',
+        plate_format: str = '96'
+    ) -> Path:
+        """
+        Write a dose batch as a G-code file for repeated runs with run_plan().
+        
+        Each well is a rapid move followed by a '(DOSE <well> <seconds>)'
+        comment, which Grbl ignores and run_plan() turns into a dispense,
+        and the file ends with an '(END <wells>)' marker.
+        Files live in the plan cache directory (_plan_cache_dir()) and are
+        named after a hash of everything that affects the G-code (including
+        the controller's X/Y offsets from cnc_settings.yaml), so an
+        unchanged plan is reused instead of recomputed. Plans are written to
+        a temporary file and renamed into place, and a cached file without
+        its END marker (e.g. from an interrupted write) is recompiled.
+        
+        Args:
+            plan_id: Human-readable name used as the file name prefix
+            jobs: Sequence of (well, target_mg) pairs
+            optimize: Visiting order, as in dose_many()
+            plate_format: Plate format ('96', '384', '1536')
+        
+        Returns:
+            Path of the (possibly cached) .nc file
+        
+        Raises:
+            RuntimeError: If the CNC has not been set up with initialize()
+        """
+        self._require_cnc("compile_plan")
+        key = repr((
+            plate_format, self._plate_origin, self._well_spacing, self.cnc_model,
+            self.cnc.X_OFFSET, self.cnc.Y_OFFSET,
+            self._flow_rate, self._cal_points, optimize,
+            [(well, float(target_mg)) for well, target_mg in jobs]
+        )).encode()
+        digest = hashlib.blake2b(key, digest_size=16).hexdigest()
+        path = self._plan_cache_dir() / f"{plan_id}-{digest}.nc"
+        end_marker = f"(END {len(jobs)})\n".encode()
+        if path.exists() and path.read_bytes().endswith(end_marker):
+            logger.info("Using cached plan %s", path)
+            return path
+        
+        wells, _, _, durations, order = self._ordered_jobs(jobs, optimize, plate_format)
+        lines = [f"(plan {plan_id}: {len(wells)} wells, {plate_format}-well plate)".encode()]
+        for i in order:
+            lines.append(self._gcode_for(wells[i], plate_format).rstrip(b"\n"))
+            lines.append(f"(DOSE {wells[i]} {durations[i]:.3f})".encode())
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(b"\n".join(lines) + b"\n" + end_marker)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        logger.info("Compiled plan %s", path)
+        return path
+    
+    def _plan_cache_dir(self) -> Path:
+        """
+        Resolve the plan cache directory at call time.
+        
+        PLAN_CACHE_DIR wins if set. Otherwise $XDG_CACHE_HOME, then
+        ~/.cache, and for accounts without a home directory the system
+        temp directory.
+        """
+        if self.PLAN_CACHE_DIR is not None:
+            return Path(self.PLAN_CACHE_DIR)
+        base = os.environ.get('XDG_CACHE_HOME')
+        if not base:
+            try:
+                base = Path.home() / '.cache'
+            except (KeyError, RuntimeError):  # No HOME and no passwd entry
+                base = tempfile.gettempdir()
+        return Path(base) / 'dose_every_well'
+    
+    def run_plan(
+        self,
+        path: Union[str, Path],
+        gate_position: Optional[float] = None,
+        **kwargs
+    ) -> List[str]:
+        """
+        Run a plan file written by compile_plan().
+        
+        Moves are sent as the stored bytes and dispense durations are read
+        from the DOSE markers, so no coordinates or durations are computed.
+        The whole file is checked before anything moves, so a truncated plan
+        raises instead of dosing only some of its wells.
+        
+        Args:
+            path: Plan file
+            gate_position: Optional gate position override
+            **kwargs: Additional parameters passed to doser.dispense()
+        
+        Returns:
+            Well IDs in the order they were dosed
+        
+        Raises:
+            RuntimeError: If the CNC has not been set up with initialize()
+            ValueError: If a DOSE marker comes before any move, or the END
+                        marker is missing or does not match the DOSE count
+        """
+        self._require_cnc("run_plan")
+        steps = []
+        move = None
+        expected = None
+        for line in Path(path).read_bytes().splitlines(keepends=True):
+            if line.startswith(b"(DOSE "):
+                well, duration = line[6:].rstrip(b")\r\n").decode().split()
+                if move is None:
+                    raise ValueError(f"Plan {path}: DOSE marker for {well} comes before any move")
+                steps.append((move, well, float(duration)))
+            elif line.startswith(b"(END "):
+                expected = int(line[5:].rstrip(b")\r\n"))
+            elif not line.startswith(b"("):
+                move = line
+        if expected != len(steps):
+            raise ValueError(f"Plan {path} is incomplete, recompile it with compile_plan()")
+        
+        for move, well, duration in steps:
+            self._move_and_dispense(
+                lambda: self.cnc.write_raw(move), duration, gate_position, **kwargs
+            )
+        logger.info("Plan %s complete: %d wells", Path(path).name, len(steps))
+        return [well for _, well, _ in steps]
+    
+    def _require_cnc(self, action: str):
+        """Raise RuntimeError if the CNC controller has not been created yet."""
+        if self.cnc is None:
+            raise RuntimeError(f"{action}() needs the CNC controller; call initialize() first")
+    
+    def dose_plate(self, mass_map: Dict[str, float], **kwargs) -> List[str]:
+        """
+        Dose a {well: target_mg} mapping; see dose_many() for options.
+        
+        Args:
+            mass_map: Dictionary mapping well IDs to target masses (mg)
+            **kwargs: Options passed to dose_many()
+        
+        Returns:
+            Well IDs in the order they were dosed
+        """
+        return self.dose_many(list(mass_map.items()), **kwargs)
+    
+    def _plan_jobs(
+        self,
+        wells: Sequence[str],
+        masses: np.ndarray,
+        plate_format: str = '96'
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Compute row/column indices, coordinates and durations for a batch.
+        
+        Well IDs are parsed once into integer arrays; coordinates then come
+        from a single fancy-index into the plate's coordinate table and
+        durations from one batched call, with no per-well arithmetic.
+        
+        Args:
+            wells: Well identifiers
+            masses: Target masses in milligrams, one per well
+            plate_format: Plate format ('96', '384', '1536')
+        
+        Returns:
+            (rows, cols, xy, durations) arrays; xy has shape (N, 2)
+        
+        Raises:
+            ValueError: If a well is malformed or not on the plate
+        """
+        table = self._coord_table(plate_format)
+        valid = _VALID_WELLS[plate_format]
+        for well in wells:
+            if well not in valid:
+                raise ValueError(f"Well {well} is not on a {plate_format}-well plate")
+        rc = np.array([_parse_well(well) for well in wells], dtype=np.intp).reshape(-1, 2)
+        rows, cols = rc[:, 0], rc[:, 1]
+        return rows, cols, table[rows, cols], self._calculate_durations(masses)
     
     def home(self):
         """Return CNC and doser to home positions."""
         logger.info("Homing CNC Dosing System...")
         if self.cnc:
-            self.cnc.home()
+            self.cnc.home_xyz()
+            self._homed = True
         if self.doser:
             self.doser.home()
     
     def shutdown(self):
-        """Safely shutdown CNC and doser."""
+        """
+        Safely shutdown CNC and doser.
+        
+        Safe to call more than once; hardware that is already released is
+        skipped. The CNC serial port is closed even if the doser fails to
+        shut down.
+        """
+        if self.cnc is None and self.doser is None:
+            return
         logger.info("Shutting down CNC Dosing System...")
-        if self.doser:
-            self.doser.shutdown()
-        if self.cnc:
-            self.cnc.disconnect()
+        try:
+            if self.doser:
+                doser, self.doser = self.doser, None
+                doser.shutdown()
+        finally:
+            if self.cnc:
+                cnc, self.cnc = self.cnc, None
+                cnc.disconnect()
+            self._homed = False
         logger.info("CNC Dosing System shutdown complete")
     
-    def calibrate_flow_rate(self, duration: float = 5.0, gate_position: float = 35):
+    def __enter__(self) -> 'CNCDosingSystem':
+        """
+        Initialize the hardware for use in a with-block.
+        
+        __exit__() does not run when __enter__() raises, so hardware already
+        opened by a failed initialize() (e.g., the CNC port when the doser
+        fails) is shut down here.
+        """
+        try:
+            self.initialize()
+        except BaseException:
+            self.shutdown()
+            raise
+        return self
+    
+    def __exit__(self, *exc_info) -> bool:
+        """Shut down the hardware, also when the block raised."""
+        self.shutdown()
+        return False
+    
+    async def calibrate_flow_rate(
+        self,
+        duration: float = 5.0,
+        gate_position: float = 35,
+        prompt_timeout: Optional[float] = None
+    ):
         """
         Helper to calibrate solid dispense flow rate.
         Run this with a balance to measure actual flow rate.
         
+        The operator prompt waits on stdin through the event loop and the
+        dispense runs in a worker thread, so other tasks on the event loop
+        (e.g., homing or status polling of other hardware) keep running
+        while this waits. Use calibrate_flow_rate_sync() from non-async code.
+        
         Args:
             duration: Dispense duration in seconds
             gate_position: Gate opening position
+            prompt_timeout: Maximum time to wait for the operator in seconds
+                            (None = wait indefinitely). Only enforced where
+                            the event loop can watch stdin (POSIX terminals
+                            and pipes)
         
-        Returns:
-            Instructions for user to measure and calculate flow rate
+        If calibration_path is set, the operator is also asked for the
+        measured mass, which is added to the calibration table and saved.
+        
+        Raises:
+            asyncio.TimeoutError: If the operator does not respond in time
+                                  (nothing is dispensed)
         """
         logger.info("=== Flow Rate Calibration ===")
-        logger.info(f"Duration: {duration}s, Gate: {gate_position}")
+        logger.info("Duration: %ss, Gate: %s", duration, gate_position)
         logger.info("Place container on balance and tare before starting")
-        input("Press Enter to start dispensing...")
         
-        self.doser.dispense(duration=duration, gate_position=gate_position)
+        await self._prompt("Press Enter to start dispensing...", prompt_timeout)
+        
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, lambda: self.doser.dispense(duration=duration, gate_position=gate_position)
+        )
+        
+        logger.info("Dispensing complete. Weigh the dispensed material.")
+        if self.calibration_path is None:
+            logger.info("Flow rate (mg/s) = measured_mass_mg / %s", duration)
+            logger.info("Then set flow_rate on this dosing system to the measured value")
+            return
+        
+        answer = await self._prompt("Measured mass in mg (blank to skip): ", prompt_timeout)
+        if answer.strip():
+            self.add_calibration_point(float(answer), duration)
+    
+    async def _prompt(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """
+        Read a line from the operator without blocking the event loop.
+        
+        stdin is switched to non-blocking mode for the wait and always read
+        through sys.stdin, so lines an earlier input() already buffered are
+        returned first and lines after this one stay buffered for later
+        input() calls. When nothing is buffered, the loop watches the stdin
+        file descriptor, so a timeout really ends the wait and leaves no
+        thread blocked in input() that would take the operator's next line.
+        Where stdin cannot be watched (Windows event loops, notebooks), a
+        worker thread reads it and the timeout is not enforced.
+        
+        Raises:
+            asyncio.TimeoutError: If no line arrives within timeout
+            EOFError: If stdin is closed, as input() would
+        """
+        loop = asyncio.get_running_loop()
+        print(prompt, end='', flush=True)
+        
+        try:
+            fd = sys.stdin.fileno()
+            os.set_blocking(fd, False)
+        except (AttributeError, OSError, ValueError):
+            return await self._prompt_in_thread(timeout)
+        
+        try:
+            line = self._read_stdin_line()
+            if line is not None:
+                return line
+            
+            done = loop.create_future()
+            
+            def on_readable():
+                if done.done():
+                    return
+                try:
+                    line = self._read_stdin_line(readable=True)
+                except EOFError as e:
+                    done.set_exception(e)
+                    return
+                if line is not None:
+                    done.set_result(line)
+            
+            try:
+                loop.add_reader(fd, on_readable)
+            except NotImplementedError:
+                os.set_blocking(fd, True)
+                return await self._prompt_in_thread(timeout)
+            try:
+                return await asyncio.wait_for(done, timeout)
+            finally:
+                loop.remove_reader(fd)
+        finally:
+            os.set_blocking(fd, True)
+    
+    def _read_stdin_line(self, readable: bool = False) -> Optional[str]:
+        """
+        Read from the non-blocking sys.stdin toward the next operator line.
+        
+        Args:
+            readable: The stdin file descriptor was reported readable, so
+                      reading nothing means end of file
+        
+        Returns:
+            The line without its newline once complete, else None
+        
+        Raises:
+            EOFError: If stdin is closed and no partial line is left
+        """
+        chunk = sys.stdin.readline()
+        if chunk and not chunk.endswith('\n'):
+            self._stdin_buf += chunk
+            return None
+        if not chunk and not (readable and self._stdin_buf):
+            if readable:
+                raise EOFError("stdin closed while waiting for the operator")
+            return None
+        line, self._stdin_buf = self._stdin_buf + chunk, ''
+        return line.rstrip('\r\n')
+    
+    async def _prompt_in_thread(self, timeout: Optional[float]) -> str:
+        """Fallback for _prompt(): blocking readline() in a worker thread."""
+        if timeout is not None:
+            logger.warning("Cannot watch stdin here, waiting without prompt_timeout")
+        raw = await asyncio.get_running_loop().run_in_executor(None, sys.stdin.readline)
+        if not raw:
+            raise EOFError("stdin closed while waiting for the operator")
+        return raw.rstrip('\r\n')
+    
+    def calibrate_flow_rate_sync(self, *args, **kwargs):
+        """Blocking wrapper around calibrate_flow_rate() for scripts and the CLI."""
+        return asyncio.run(self.calibrate_flow_rate(*args, **kwargs))
+    
+    def _gcode_for(self, well: str, plate_format: str = '96') -> bytes:
+        """
+        Get the G-code move to a well, formatted once and cached.
+        
+        Args:
+            well: Well identifier (e.g., 'A1')
+            plate_format: Plate format ('96', '384', '1536')
+        
+        Returns:
+            G-code line as bytes, ready for cnc.write_raw()
+        """
+        key = (well, plate_format)
+        gcode = self._gcode_cache.get(key)
+        if gcode is None:
+            gcode = self._gcode_cache[key] = self.cnc.format_move(
+                *self._well_to_coords(well, plate_format)
+            )
+        return gcode
+    
+    def _coord_table(self, plate_format: str) -> np.ndarray:
+        """
+        Get the coordinate table of a plate format, building it on first use.
+        
+        Args:
+            plate_format: Plate format ('96', '384', '1536')
+        
+        Returns:
+            Array of shape (rows, cols, 2); [r, c] holds (x, y) in mm
         
-        logger.info(f"Dispensing complete. Weigh the dispensed material.")
-        logger.info(f"Flow rate (mg/s) = measured_mass_mg / {duration}")
-        logger.info(f"Update _calculate_duration() with measured flow rate")
+        Raises:
+            ValueError: If the plate format is unknown
+        """
+        table = self._coord_tables.get(plate_format)
+        if table is None:
+            try:
+                rows, cols, pitch = _PLATE_SPECS[plate_format]
+            except KeyError:
+                raise ValueError(
+                    f"Unknown plate format {plate_format!r}, "
+                    f"expected one of {sorted(_PLATE_SPECS, key=int)}"
+                ) from None
+            spacing = pitch if self._well_spacing is None else self._well_spacing
+            table = self._coord_tables[plate_format] = self._build_coord_table(rows, cols, spacing)
+        return table
+    
+    def _build_coord_table(self, rows: int, cols: int, spacing: float) -> np.ndarray:
+        """
+        Compute XY coordinates of every well of a rows x cols plate.
+        
+        Returns:
+            Array of shape (rows, cols, 2); [r, c] holds (x, y) in mm
+        """
+        # (col, row) index grid -> origin + index * spacing in one broadcast
+        col_idx, row_idx = np.meshgrid(np.arange(cols), np.arange(rows))
+        grid = np.stack((col_idx, row_idx), axis=-1)
+        return self._origin_arr + grid * spacing
     
     def _well_to_coords(self, well: str, plate_format: str = '96') -> Tuple[float, float]:
         """
@@ -166,20 +983,26 @@ class CNCDosingSystem:
         
         Args:
             well: Well identifier (e.g., 'A1', 'H12')
-            plate_format: Plate format ('96', '384')
+            plate_format: Plate format ('96', '384', '1536')
         
         Returns:
             (x, y) coordinates in mm
+        
+        Raises:
+            ValueError: If the well is not on the plate
         """
-        # Parse well ID
-        row = ord(well[0].upper()) - ord('A')
-        col = int(well[1:]) - 1
+        key = (well, plate_format)
+        coords = self._coord_cache.get(key)
+        if coords is not None:
+            return coords
         
-        # Calculate position
-        x = self.plate_origin[0] + (col * self.well_spacing)
-        y = self.plate_origin[1] + (row * self.well_spacing)
+        table = self._coord_table(plate_format)
+        if well not in _VALID_WELLS[plate_format]:
+            raise ValueError(f"Well {well} is not on a {plate_format}-well plate")
+        row, col = _parse_well(well)
         
-        return (x, y)
+        coords = self._coord_cache[key] = tuple(table[row, col].tolist())
+        return coords
     
     def _calculate_duration(self, target_mg: float) -> float:
         """
@@ -192,48 +1015,62 @@ class CNCDosingSystem:
             Duration in seconds
         
         Note:
-            This uses a default flow rate estimate.
+            Interpolated from the calibration table if one is loaded,
+            otherwise target_mg / flow_rate.
             Use calibrate_flow_rate() to measure actual flow rate.
         """
-        # Default flow rate estimate (mg/s)
-        # TODO: Calibrate this value for your specific setup
-        flow_rate = 2.0  # mg/s
-        
-        duration = target_mg / flow_rate
+        duration = float(self._calculate_durations(target_mg))
         
-        logger.debug(f"Target {target_mg:.2f}mg @ {flow_rate:.2f}mg/s = {duration:.2f}s")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Target %.2fmg -> %.2fs", target_mg, duration)
         
         return duration
+    
+    def _calculate_durations(self, targets_mg) -> np.ndarray:
+        """
+        Batch version of _calculate_duration() for many wells at once.
+        
+        Args:
+            targets_mg: Sequence or array of target masses in milligrams
+        
+        Returns:
+            Array of durations in seconds
+        """
+        targets = np.asarray(targets_mg, dtype=float)
+        if self._cal_mg is None:
+            return targets / self._flow_rate
+        
+        durations = np.interp(targets, self._cal_mg, self._cal_dur)
+        # Beyond the largest calibrated mass, extrapolate at that point's rate
+        return np.where(
+            targets > self._cal_mg[-1],
+            targets * (self._cal_dur[-1] / self._cal_mg[-1]),
+            durations
+        )
 
 
 if __name__ == "__main__":
     # Example usage
+    configure_once()
     print("=== CNC Dosing System Test ===")
     
     try:
-        dosing = CNCDosingSystem(
+        with CNCDosingSystem(
             cnc_port='/dev/ttyUSB0',
             doser_params={'i2c_address': 0x40, 'motor_gpio_pin': 17}
-        )
-        
-        dosing.initialize()
-        
-        # Test: dose to a single well
-        choice = input("Run dose test to well A1 (Y/N)? ").strip().upper()
-        if choice == 'Y':
-            target = float(input("Target mass (mg): "))
-            dosing.dose_to_well('A1', target_mg=target)
-        
-        # Calibration option
-        choice = input("Run flow rate calibration (Y/N)? ").strip().upper()
-        if choice == 'Y':
-            dosing.calibrate_flow_rate()
+        ) as dosing:
+            # Test: dose to a single well
+            choice = input("Run dose test to well A1 (Y/N)? ").strip().upper()
+            if choice == 'Y':
+                target = float(input("Target mass (mg): "))
+                dosing.dose_to_well('A1', target_mg=target)
+            
+            # Calibration option
+            choice = input("Run flow rate calibration (Y/N)? ").strip().upper()
+            if choice == 'Y':
+                asyncio.run(dosing.calibrate_flow_rate())
         
     except KeyboardInterrupt:
         print("\n\nInterrupted by user")
     except Exception as e:
-        logger.error(f"Error: {e}", exc_info=True)
-    finally:
-        if 'dosing' in locals():
-            dosing.shutdown()
-
+        logger.error("Error: %s", e, exc_info=True)
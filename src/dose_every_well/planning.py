@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Motion planning helpers for plate dosing.
+
+Orders wells so the CNC travels less between dispenses. Plates have at most
+a few hundred wells, so simple O(N^2) NumPy heuristics are fast enough.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def nearest_neighbor_order(
+    xy: np.ndarray,
+    start: Optional[Tuple[float, float]] = None
+) -> np.ndarray:
+    """
+    Greedy nearest-neighbor tour over a set of points.
+    
+    Args:
+        xy: Array of shape (N, 2) with point coordinates
+        start: Position the tour starts from (default: the first point)
+    
+    Returns:
+        Permutation of range(N) giving the visiting order
+    """
+    xy = np.asarray(xy, dtype=float)
+    n_points = len(xy)
+    order = np.empty(n_points, dtype=np.intp)
+    if n_points == 0:
+        return order
+    
+    visited = np.zeros(n_points, dtype=bool)
+    cur = xy[0] if start is None else np.asarray(start, dtype=float)
+    for i in range(n_points):
+        dist = np.sum((xy - cur) ** 2, axis=1)
+        dist[visited] = np.inf
+        nxt = int(np.argmin(dist))
+        order[i] = nxt
+        visited[nxt] = True
+        cur = xy[nxt]
+    return order
+
+
+def serpentine_order(rows: Sequence[int], cols: Sequence[int]) -> np.ndarray:
+    """
+    Boustrophedon order: even rows left to right, odd rows right to left.
+    
+    Args:
+        rows: Zero-based row index of each well
+        cols: Zero-based column index of each well
+    
+    Returns:
+        Permutation of range(N) giving the visiting order
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    cols = np.asarray(cols, dtype=np.intp)
+    if rows.size == 0:
+        return np.empty(0, dtype=np.intp)
+    width = int(cols.max()) + 1
+    key = rows * width + np.where(rows % 2 == 0, cols, width - 1 - cols)
+    return np.argsort(key, kind='stable')
+
+
+def tour_length(xy: np.ndarray, order: Sequence[int]) -> float:
+    """
+    Total straight-line travel distance of visiting points in order.
+    
+    Args:
+        xy: Array of shape (N, 2) with point coordinates
+        order: Visiting order (indices into xy)
+    
+    Returns:
+        Sum of distances between consecutive points
+    """
+    path = np.asarray(xy, dtype=float)[np.asarray(order, dtype=np.intp)]
+    return float(np.sum(np.hypot(*np.diff(path, axis=0).T)))
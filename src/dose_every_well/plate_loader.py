@@ -57,12 +57,8 @@ except ImportError as e:
     print("  pip install adafruit-circuitpython-pca9685 adafruit-circuitpython-motor")
     raise e
 
+from ._logconfig import configure_once
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -793,6 +789,7 @@ class PlateLoader:
 
 def main():
     """Example usage of PlateLoader"""
+    configure_once()
     print("=== Plate Loader Controller ===")
     print("Initializing...")
     
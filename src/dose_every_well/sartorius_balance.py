@@ -1,8 +1,439 @@
-from datetime import datetime
-from matterlab_balances import SartoriusBalance
-from pathlib import Path
-
-# if __name__ == "__main__":
-bal = SartoriusBalance(com_port="/dev/ttyUSB1")
-weigh = bal.weigh()
-print((f"weigh"))
\ No newline at end of file
+#!/usr/bin/env python3
+"""
+Sartorius Balance Driver
+Talks to a Sartorius precision balance over USB serial using the SBI protocol.
+
+Frames are read by waiting for the port with select() and draining the serial
+RX buffer into an in-memory buffer, then splitting on the CR LF terminator, so
+a weigh() costs one or two read() calls instead of one per byte and returns
+as soon as the reply arrives. Bytes received after a complete frame are kept for
+the next call.
+
+Hardware:
+- Sartorius balance with RS-232/USB interface (SBI protocol)
+- Default interface settings: 9600 baud, 7 data bits, odd parity, 1 stop bit
+
+Simple Usage:
+    balance = SartoriusBalance(com_port='/dev/ttyUSB1')
+    balance.tare()
+    mass_g = balance.weigh()
+    balance.close()
+"""
+
+import re
+import time
+import logging
+import threading
+from collections import deque
+from statistics import fmean, pstdev
+from typing import List, Optional, Sequence, Tuple
+
+import serial
+
+from .serial_utils import read_available
+
+logger = logging.getLogger(__name__)
+
+# Optional ID prefix (e.g. b"N     "), then sign, value and unit of an SBI
+# print frame, e.g. b"+    0.0234 g  " (the unit is left blank while the
+# reading is unstable). The prefix may not run into an error ("Err 02"),
+# overload ("High"), underload ("Low") or status token, with or without an ID
+# in front, so their codes are never read as a mass. Frames are parsed as
+# bytes so no decode or split is needed per reading.
+_MASS_PATTERN = (
+    rb"(?:(?!Err|ERR|High|Low|Stat)[^\r\n\d+-])*([+-]?) *(\d+\.?\d*) *([a-z]*)"
+)
+_MASS_RE = re.compile(_MASS_PATTERN)
+
+# One complete frame inside a buffer of several. Matches start at a line
+# start and only spaces are allowed inside, so a match never spans frames.
+_FRAME_RE = re.compile(rb"^" + _MASS_PATTERN + rb"[^\r\n]*\r\n", re.M)
+
+# Conversion factors from balance display unit to grams
+_UNIT_TO_G = {b'': 1.0, b'g': 1.0, b'mg': 1e-3, b'kg': 1e3}
+
+
+def parse_frames(buf: bytes) -> Tuple[List[Tuple[float, bool]], int]:
+    """
+    Parse every complete frame in a buffer in a single regex pass.
+
+    Lines that do not hold a weight value (e.g. error messages) are skipped.
+    A reading is stable when the balance printed a unit, since SBI leaves the
+    unit blank while the value is still moving.
+
+    Args:
+        buf: Raw bytes received from the balance
+
+    Returns:
+        List of (grams, stable) readings, and the number of bytes consumed
+        (everything up to the last terminator)
+    """
+    readings = []
+    for sign, value, unit in _FRAME_RE.findall(buf):
+        factor = _UNIT_TO_G.get(unit)
+        if factor is None:
+            continue
+        mass = float(value) * factor
+        readings.append((-mass if sign == b'-' else mass, unit != b''))
+    end = buf.rfind(b"\r\n")
+    return readings, end + 2 if end >= 0 else 0
+
+
+def is_stable(readings: Sequence[float], tau: float = 0.08, floor_g: float = 1e-4) -> bool:
+    """
+    Check whether a window of readings has settled.
+
+    The coefficient of variation (std / |mean|) must be below tau. Near zero,
+    where the CV is meaningless, a standard deviation below floor_g also counts
+    as stable.
+
+    Args:
+        readings: Consecutive readings in grams
+        tau: Maximum coefficient of variation
+        floor_g: Standard deviation always considered stable (grams)
+
+    Returns:
+        True if the readings are stable
+    """
+    std = pstdev(readings)
+    return std <= floor_g or std < tau * abs(fmean(readings))
+
+
+class SartoriusBalance:
+    """
+    Minimal SBI driver for Sartorius precision balances.
+
+    Attributes:
+        CMD_PRINT: SBI command requesting the current weight value
+        CMD_TARE: SBI command to tare/zero the balance
+        TERMINATOR: End-of-frame marker sent by the balance
+    """
+
+    # SBI commands (ESC + letter + CR LF)
+    CMD_PRINT = b"\x1bP\r\n"
+    CMD_TARE = b"\x1bT\r\n"
+
+    TERMINATOR = b"\r\n"
+
+    def __init__(
+        self,
+        com_port: str = '/dev/ttyUSB1',
+        baudrate: int = 9600,
+        timeout: float = 1.0,
+        ser: Optional[serial.Serial] = None
+    ):
+        """
+        Connect to the balance.
+
+        Args:
+            com_port: Serial port for the balance (e.g., '/dev/ttyUSB1')
+            baudrate: Interface baud rate configured on the balance
+            timeout: Maximum time to wait for a frame in seconds
+            ser: Already-open serial connection to reuse instead of opening
+                 com_port (baudrate and timeout are then ignored)
+        """
+        self.com_port = com_port
+        self.ser = ser if ser is not None else self.open_port(com_port, baudrate, timeout)
+
+        # Bytes received from the balance but not yet consumed as a frame
+        self._buf = b""
+
+        # Number of readings averaged by weigh()
+        self.samples = 1
+
+        # Continuous monitoring (see start_continuous)
+        self.readings = deque(maxlen=64)
+        self._lock = threading.Lock()
+        self._monitor = None
+        self._monitor_stop = threading.Event()
+
+        logger.info("Sartorius balance connected on %s", com_port)
+
+    @staticmethod
+    def open_port(
+        com_port: str,
+        baudrate: int = 9600,
+        timeout: float = 1.0
+    ) -> serial.Serial:
+        """
+        Open a serial connection with the balance's interface settings.
+
+        Args:
+            com_port: Serial port for the balance (e.g., '/dev/ttyUSB1')
+            baudrate: Interface baud rate configured on the balance
+            timeout: Maximum time to wait for a frame in seconds
+
+        Returns:
+            Open serial.Serial instance
+        """
+        return serial.Serial(
+            com_port,
+            baudrate=baudrate,
+            bytesize=serial.SEVENBITS,
+            parity=serial.PARITY_ODD,
+            stopbits=serial.STOPBITS_ONE,
+            timeout=timeout
+        )
+
+    def _read_frame(self) -> bytes:
+        """
+        Read one complete frame from the balance.
+
+        Already-buffered frames are returned before going back to the serial
+        port. Otherwise the port is polled until data arrives and the RX
+        buffer is drained in one read() until a terminator is seen.
+
+        Returns:
+            Frame contents without the terminator
+
+        Raises:
+            TimeoutError: If the balance stops sending before a frame completes
+        """
+        while True:
+            end = self._buf.find(self.TERMINATOR)
+            if end >= 0:
+                frame = self._buf[:end]
+                self._buf = self._buf[end + len(self.TERMINATOR):]
+                return frame
+
+            chunk = read_available(self.ser)
+            if not chunk:
+                raise TimeoutError(f"No response from balance on {self.com_port}")
+            self._buf += chunk
+
+    def read_frames(self, timeout: float = 0.0) -> List[Tuple[float, bool]]:
+        """
+        Parse all frames the balance has sent so far.
+
+        Intended for balances set to print automatically (SBI menu), where
+        several frames can queue up between calls. They are parsed in one
+        pass instead of one _read_frame()/_parse_frame() round per frame.
+        Used by the start_continuous(auto_print=True) monitor.
+
+        Args:
+            timeout: Time to wait for data if nothing is queued, in seconds
+                     (0 returns immediately)
+
+        Returns:
+            List of (grams, stable) readings, oldest first
+        """
+        with self._lock:
+            self._buf += read_available(self.ser, timeout)
+            readings, consumed = parse_frames(self._buf)
+            self._buf = self._buf[consumed:]
+        return readings
+
+    def _query(self, command: bytes) -> bytes:
+        """
+        Send a command and return the balance's reply frame.
+
+        Stale input is discarded first so the reply cannot be confused with
+        an earlier unsolicited frame.
+        """
+        with self._lock:
+            self._buf = b""
+            self.ser.reset_input_buffer()
+            self.ser.write(command)
+            return self._read_frame()
+
+    @staticmethod
+    def _parse_frame(frame: bytes) -> float:
+        """
+        Parse an SBI print frame into a mass in grams.
+
+        Args:
+            frame: Raw frame, e.g. b'+    0.0234 g'
+
+        Returns:
+            Mass in grams
+
+        Raises:
+            ValueError: If the frame does not contain a weight value (e.g.
+                        an error, overload or underload report)
+        """
+        return SartoriusBalance._parse_reading(frame)[0]
+
+    @staticmethod
+    def _parse_reading(frame: bytes) -> Tuple[float, bool]:
+        """
+        Parse an SBI print frame into a mass and the balance's stability flag.
+
+        The reading is stable when the balance printed a unit, since SBI
+        leaves the unit blank while the value is still moving.
+
+        Returns:
+            (grams, stable)
+
+        Raises:
+            ValueError: If the frame does not contain a weight value
+        """
+        match = _MASS_RE.match(frame)
+        if match is None or match.group(3) not in _UNIT_TO_G:
+            raise ValueError(f"Unexpected balance response: {frame!r}")
+        sign, value, unit = match.groups()
+        mass = float(value) * _UNIT_TO_G[unit]
+        return -mass if sign == b'-' else mass, unit != b''
+
+    def set_samples(self, samples: int):
+        """
+        Set the number of readings averaged by weigh().
+
+        Args:
+            samples: Number of readings (>= 1)
+        """
+        if samples < 1:
+            raise ValueError(f"samples must be >= 1, got {samples}")
+        self.samples = samples
+
+    def weigh(self) -> float:
+        """
+        Read the current weight, averaged over `samples` readings.
+
+        Returns:
+            Mass in grams
+        """
+        total = 0.0
+        for _ in range(self.samples):
+            total += self.read_sample()
+        return total / self.samples
+
+    def read_sample(self) -> float:
+        """
+        Take a single reading, bypassing the averaging done by weigh().
+
+        Returns:
+            Mass in grams
+        """
+        return self.read_reading()[0]
+
+    def read_reading(self) -> Tuple[float, bool]:
+        """
+        Take a single reading along with the balance's own stability flag.
+
+        Returns:
+            (grams, stable); stable is False while the balance reports the
+            value as still moving
+        """
+        return self._parse_reading(self._query(self.CMD_PRINT))
+
+    def tare(self, settle: float = 1.0):
+        """
+        Tare (zero) the balance and wait for it to re-zero.
+
+        The balance acknowledges nothing, and readings taken right after
+        the command can still show the old load, so this waits `settle`
+        seconds before returning.
+
+        Args:
+            settle: Time for the balance to settle after taring, in seconds
+        """
+        with self._lock:
+            self._buf = b""
+            self.ser.write(self.CMD_TARE)
+        time.sleep(settle)
+        self.readings.clear()
+
+    def start_continuous(self, interval: float = 0.1, auto_print: bool = False):
+        """
+        Start monitoring the balance in a background thread.
+
+        Readings are appended to `readings` as (time.monotonic(), grams,
+        stable) tuples, stable being the balance's own flag, so callers can
+        take the latest settled value without waiting for a weigh() cycle.
+        Sartorius SBI has no standard continuous-output command that works
+        regardless of the balance menu setup, so by default the thread polls
+        with the print command. With auto_print=True (balance set to print
+        automatically in its menu) no commands are sent; the thread waits for
+        frames and parses everything queued in one pass with read_frames().
+
+        Args:
+            interval: Delay between readings in seconds (with auto_print,
+                      the maximum wait for new frames)
+            auto_print: The balance prints frames on its own
+        """
+        if self._monitor is not None:
+            return
+        self.readings.clear()
+        self._monitor_stop.clear()
+        self._monitor = threading.Thread(
+            target=self._monitor_loop, args=(interval, auto_print), daemon=True
+        )
+        self._monitor.start()
+
+    def stop_continuous(self):
+        """Stop background monitoring started by start_continuous()."""
+        if self._monitor is None:
+            return
+        self._monitor_stop.set()
+        self._monitor.join()
+        self._monitor = None
+
+    def _monitor_loop(self, interval: float, auto_print: bool):
+        """Background thread body for start_continuous()."""
+        while not self._monitor_stop.is_set():
+            if auto_print:
+                frames = self.read_frames(timeout=interval)
+                now = time.monotonic()
+                self.readings.extend((now, mass, stable) for mass, stable in frames)
+                continue
+            try:
+                mass, stable = self.read_reading()
+                self.readings.append((time.monotonic(), mass, stable))
+            except (TimeoutError, ValueError) as e:
+                logger.debug("Skipping balance reading: %s", e)
+            self._monitor_stop.wait(interval)
+
+    def latest_stable(
+        self,
+        window: int = 4,
+        tau: float = 0.08,
+        timeout: float = 10.0
+    ) -> float:
+        """
+        Wait for the monitored readings to settle and return their mean.
+
+        Only readings taken after this call are considered, so material added
+        just before calling is always reflected. Every reading in the window
+        must also be flagged stable by the balance. Requires start_continuous()
+        to be running.
+
+        Args:
+            window: Number of most recent readings that must be stable
+            tau: Maximum coefficient of variation over the window
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            Mean of the stable window in grams
+
+        Raises:
+            RuntimeError: If continuous monitoring is not running
+            TimeoutError: If the readings do not settle within timeout
+        """
+        if self._monitor is None:
+            raise RuntimeError("Continuous monitoring not started")
+
+        start = time.monotonic()
+        deadline = start + timeout
+        while time.monotonic() < deadline:
+            recent = [r for r in list(self.readings)[-window:] if r[0] >= start]
+            masses = [mass for _, mass, _ in recent]
+            if (len(recent) == window and all(stable for _, _, stable in recent)
+                    and is_stable(masses, tau)):
+                return fmean(masses)
+            time.sleep(0.05)
+        raise TimeoutError(f"Balance reading did not settle within {timeout}s")
+
+    def close(self):
+        """Close the serial connection."""
+        self.stop_continuous()
+        if self.ser.is_open:
+            self.ser.close()
+        logger.info("Sartorius balance disconnected")
+
+
+if __name__ == "__main__":
+    bal = SartoriusBalance(com_port="/dev/ttyUSB1")
+    try:
+        print(f"Weight: {bal.weigh():.4f} g")
+    finally:
+        bal.close()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Serial port helpers shared by the balance and CNC connections.
+
+USB-serial adapters (FTDI and similar) buffer incoming bytes for up to
+`latency_timer` milliseconds (16 ms by default) before handing them to the
+host, which puts a floor under every command/reply round-trip. Lowering the
+timer to 1 ms lets replies through as soon as they arrive.
+
+read_available() waits for incoming data with select() and then drains
+everything the driver holds in one os.read(), so a read returns as soon as
+the first bytes arrive instead of waiting on pyserial's timeout logic.
+
+Usage:
+    from dose_every_well.serial_utils import tune_serial_latency
+    tune_serial_latency('/dev/ttyUSB0')
+"""
+
+import os
+import time
+import select
+import struct
+import logging
+import platform
+import subprocess
+from typing import Optional
+
+try:
+    import fcntl
+    import termios
+    _TIOCINQ = termios.TIOCINQ
+except (ImportError, AttributeError):  # Windows
+    fcntl = None
+    _TIOCINQ = None
+
+logger = logging.getLogger(__name__)
+
+# in_waiting poll interval of read_available() when select() can't be used
+_POLL_INTERVAL = 0.001
+
+# Ports whose adapter latency timer was already set in this process
+_tuned_ports = set()
+
+# udev rule that applies the 1 ms latency timer to every USB-serial adapter
+UDEV_RULE = 'ACTION=="add", SUBSYSTEM=="usb-serial", ATTR{latency_timer}="1"'
+
+
+def tune_serial_latency(port: str, ser: Optional[object] = None):
+    """
+    Set the USB-serial latency timer of a port to 1 ms.
+
+    Writes the sysfs latency_timer of the adapter, falling back to
+    `setserial <port> low_latency` if sysfs is not writable. If an open
+    pyserial connection is given, also sets the ASYNC_LOW_LATENCY flag on it.
+    Only done on Linux. The adapter's latency timer is set once per port and
+    process, but the flag is set on every call, since it belongs to the open
+    connection and is lost when the port is closed and reopened. Failures
+    are logged and otherwise ignored.
+
+    Args:
+        port: Serial device path (e.g., '/dev/ttyUSB0')
+        ser: Optional open serial.Serial instance for the same port
+    """
+    if platform.system() != "Linux":
+        return
+    if port not in _tuned_ports:
+        _tuned_ports.add(port)
+        _set_latency_timer(port)
+
+    # pyserial implements the TIOCGSERIAL/TIOCSSERIAL round-trip on Linux
+    if ser is not None and hasattr(ser, 'set_low_latency_mode'):
+        try:
+            ser.set_low_latency_mode(True)
+        except (OSError, ValueError, NotImplementedError) as e:
+            logger.debug("Could not set low latency mode on %s: %s", port, e)
+
+
+def _set_latency_timer(port: str):
+    """Write the adapter's sysfs latency_timer, falling back to setserial."""
+    tty = os.path.basename(os.path.realpath(port))
+    latency_path = f"/sys/bus/usb-serial/devices/{tty}/latency_timer"
+    try:
+        with open(latency_path, 'w') as f:
+            f.write("1")
+        logger.info("Set USB latency timer of %s to 1 ms", port)
+    except PermissionError:
+        if not _setserial_low_latency(port):
+            logger.warning(
+                "No permission to set USB latency timer of %s. "
+                "Run as root, or add the udev rule '%s' "
+                "(e.g., /etc/udev/rules.d/99-usb-serial-latency.rules).",
+                port, UDEV_RULE
+            )
+    except OSError:
+        logger.debug("%s has no USB latency timer, skipping", port)
+
+
+def _setserial_low_latency(port: str) -> bool:
+    """Run `setserial <port> low_latency`; return True if it succeeded."""
+    try:
+        result = subprocess.run(
+            ["setserial", port, "low_latency"],
+            check=False, capture_output=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug("setserial not available: %s", e)
+        return False
+    if result.returncode != 0:
+        logger.debug(
+            "setserial failed on %s: %s", port, result.stderr.decode(errors='replace').strip()
+        )
+        return False
+    logger.info("Enabled low_latency on %s via setserial", port)
+    return True
+
+
+def read_available(ser, timeout: Optional[float] = None) -> bytes:
+    """
+    Wait for data on a serial port and return everything received so far.
+
+    On POSIX the port's file descriptor is polled with select() and the
+    number of pending bytes is taken from TIOCINQ, so the call returns as
+    soon as data arrives. Elsewhere (or for port objects without a real file
+    descriptor) it polls ser.in_waiting until data arrives or the timeout
+    expires, so a short timeout is honored even on ports opened without one.
+
+    Args:
+        ser: Open serial.Serial instance
+        timeout: Maximum time to wait in seconds (default: ser.timeout)
+
+    Returns:
+        Received bytes, or b"" if nothing arrived within the timeout
+    """
+    if timeout is None:
+        timeout = ser.timeout
+
+    try:
+        fd = ser.fileno() if _TIOCINQ is not None else None
+    except (AttributeError, OSError, ValueError):
+        fd = None
+    if fd is None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            waiting = ser.in_waiting
+            if waiting:
+                return ser.read(waiting)
+            if deadline is None:
+                time.sleep(_POLL_INTERVAL)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return b""
+            time.sleep(min(_POLL_INTERVAL, remaining))
+
+    ready, _, _ = select.select([fd], [], [], timeout)
+    if not ready:
+        return b""
+    pending = struct.unpack('I', fcntl.ioctl(fd, _TIOCINQ, b'\0\0\0\0'))[0]
+    return os.read(fd, max(1, pending))
@@ -38,12 +38,8 @@ except ImportError as e:
     print("  pip install rpi-lgpio  # Required for Raspberry Pi 5")
     raise e
 
+from ._logconfig import configure_once
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -103,13 +99,19 @@ class SolidDoser:
         """
         logger.info("Initializing Solid Doser...")
         
-        # Store GPIO pin (setup happens in motor_on)
+        # Relay pin is configured once here; motor_on/off only toggle its level
         self.dc_relay_pin = motor_gpio_pin
+        self._relay_on = GPIO.HIGH if self.RELAY_NO else GPIO.LOW
+        self._relay_off = GPIO.LOW if self.RELAY_NO else GPIO.HIGH
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)
+        GPIO.setup(self.dc_relay_pin, GPIO.OUT, initial=self._relay_off)
         
         # Initialize I2C bus
         self.i2c = busio.I2C(board.SCL, board.SDA)
         
-        # Initialize PCA9685
+        # Initialize PCA9685 (PWM frequency is set once; servo moves are
+        # duty-cycle writes only)
         self.pca = PCA9685(self.i2c, address=i2c_address)
         self.pca.frequency = frequency
         
@@ -120,8 +122,9 @@ class SolidDoser:
             max_pulse=2500
         )
         
-        # Current positions/states (in user coordinates)
-        self._gate_position = self.GATE_MAX_CONTRACTION  # Start contracted (closed)
+        # Current positions/states (in user coordinates). The servo position
+        # is unknown until the first write, so the close below always moves it.
+        self._gate_position = None
         self._motor_running = False
         
         # Initialize to safe state
@@ -179,16 +182,11 @@ class SolidDoser:
     def motor_on(self):
         """
         Turn DC motor ON via relay.
-        Sets up GPIO and turns motor on.
+        Drives the relay pin configured in __init__ to its ON level.
         """
         if not self._motor_running:
             logger.info("Starting motor...")
-            # Setup GPIO and turn ON
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setwarnings(False)
-            # Active HIGH: HIGH=ON, LOW=OFF
-            on_state = GPIO.HIGH if self.RELAY_NO else GPIO.LOW
-            GPIO.setup(self.dc_relay_pin, GPIO.OUT, initial=on_state)
+            GPIO.output(self.dc_relay_pin, self._relay_on)
             self._motor_running = True
             logger.info(f"Waiting {self.MOTOR_STARTUP_DELAY}s for motor to reach steady state...")
             time.sleep(self.MOTOR_STARTUP_DELAY)
@@ -197,10 +195,10 @@ class SolidDoser:
     def motor_off(self):
         """
         Turn DC motor OFF via relay.
-        Uses GPIO.cleanup() to reset pin and turn off motor.
+        Drives the relay pin to its OFF level; the pin stays configured.
         """
         logger.info("Stopping motor...")
-        GPIO.cleanup()
+        GPIO.output(self.dc_relay_pin, self._relay_off)
         self._motor_running = False
     
     def open_gate(self, gate_position: Optional[float] = None):
@@ -216,11 +214,11 @@ class SolidDoser:
         target = gate_position if gate_position is not None else self.GATE_MAX_EXTENSION
         target = max(self.GATE_CONTACT, min(target, self.GATE_MAX_EXTENSION))
         
+        if target == self._gate_position:
+            return
         servo_angle = self._gate_to_servo_angle(target)
         logger.info(f"Opening gate to position {target} (servo {servo_angle}°)")
-        self.gate_servo.angle = servo_angle
-        self._gate_position = target
-        time.sleep(self.SERVO_MOVE_DELAY)  # Power-safe delay
+        self._move_gate(target)
     
     def close_gate(self):
         """
@@ -229,11 +227,11 @@ class SolidDoser:
         Power-safe: Includes delay after movement.
         """
         target = self.GATE_MAX_CONTRACTION
+        if target == self._gate_position:
+            return
         servo_angle = self._gate_to_servo_angle(target)
         logger.info(f"Closing gate from position {self._gate_position} to {target} (servo {servo_angle}°)")
-        self.gate_servo.angle = servo_angle
-        self._gate_position = target
-        time.sleep(self.SERVO_MOVE_DELAY)  # Power-safe delay
+        self._move_gate(target)
     
     def set_gate_position(self, gate_position: float):
         """
@@ -246,9 +244,21 @@ class SolidDoser:
                           0 = contact point (servo 65°)
         """
         target = max(self.GATE_MAX_CONTRACTION, min(gate_position, self.GATE_MAX_EXTENSION))
+        if target == self._gate_position:
+            return
         servo_angle = self._gate_to_servo_angle(target)
         logger.info(f"Setting gate to position {target} (servo {servo_angle}°)")
-        self.gate_servo.angle = servo_angle
+        self._move_gate(target)
+    
+    def _move_gate(self, target: float):
+        """
+        Write the gate servo and wait for it to settle.
+        
+        Callers skip this when the gate is already at target, which saves
+        the PCA9685 I2C write and the power-safe delay (e.g., closing an
+        already closed gate in home()).
+        """
+        self.gate_servo.angle = self._gate_to_servo_angle(target)
         self._gate_position = target
         time.sleep(self.SERVO_MOVE_DELAY)  # Power-safe delay
     
@@ -272,7 +282,37 @@ class SolidDoser:
         
         try:
             # Step 1: Start motor (includes startup delay)
-            self.motor_on()
+            self.prepare_dispense()
+        except BaseException:
+            self.motor_off()
+            raise
+        
+        # Steps 2-5
+        self.trigger_dispense(duration, gate_position)
+    
+    def prepare_dispense(self):
+        """
+        First half of dispense(): start the motor and wait for steady state.
+        
+        The gate stays closed, so nothing is dispensed yet. This can run while
+        the doser is still being moved over the well; follow it with
+        trigger_dispense() once in position.
+        """
+        self.motor_on()
+    
+    def trigger_dispense(self, duration: float, gate_position: Optional[float] = None):
+        """
+        Second half of dispense(): open gate, dispense, close gate, stop motor.
+        
+        Starts the motor first if prepare_dispense() was not called.
+        
+        Args:
+            duration: Dispensing time in seconds
+            gate_position: Gate position in user coordinates (None = fully extended to 35)
+                          Range: 0 (contact) to 35 (fully extended)
+        """
+        try:
+            self.motor_on()  # No-op if already running
             
             # Step 2: Open gate (motor already at steady state)
             if gate_position is not None:
@@ -368,13 +408,15 @@ class SolidDoser:
         Safely shutdown the controller.
         """
         logger.info("Shutting down Solid Doser...")
-        self.home()  # This calls motor_off() which does GPIO.cleanup()
+        self.home()  # Motor off and gate closed before releasing hardware
+        GPIO.cleanup(self.dc_relay_pin)
         self.pca.deinit()
         logger.info("Solid Doser shutdown complete")
 
 
 def main():
     """Example usage of SolidDoser"""
+    configure_once()
     print("=== Solid Doser Controller ===")
     print("Hardware: Waveshare PCA9685 HAT + GPIO Relay")
     print("Initializing...")
@@ -0,0 +1,184 @@
+import threading
+import time
+import warnings
+
+import pytest
+
+pytest.importorskip("matplotlib")  # Imported by cnc_controller for the simulator
+
+from dose_every_well.cnc_controller import CNC_Controller
+
+CONFIG = {
+    'controller': {
+        'baud_rate': 115200,
+        'x_low_bound': 0, 'x_high_bound': 400,
+        'y_low_bound': 0, 'y_high_bound': 400,
+        'z_low_bound': -50, 'z_high_bound': 0,
+        'x_offset': 0, 'y_offset': 0,
+    }
+}
+
+
+class FakeGrbl:
+    """
+    Serial port stand-in that acknowledges each received line like Grbl.
+
+    Without a fileno() it goes through read_available()'s in_waiting path.
+    Tracks the most bytes ever sent but not yet acknowledged.
+    """
+
+    timeout = None
+
+    def __init__(self, reply=True, delay=0.001):
+        self.reply = reply
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.inbound = b""
+        self.written = []
+        self.unacked = 0
+        self.max_unacked = 0
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            return len(self.inbound)
+
+    def read(self, n):
+        with self.lock:
+            data, self.inbound = self.inbound[:n], self.inbound[n:]
+        return data
+
+    def write(self, data):
+        with self.lock:
+            self.written.append(data)
+            self.unacked += len(data)
+            self.max_unacked = max(self.max_unacked, self.unacked)
+        if self.reply:
+            threading.Timer(self.delay, self._ack, args=(len(data),)).start()
+
+    def _ack(self, size):
+        with self.lock:
+            self.unacked -= size
+            self.inbound += b"ok\r\n"
+
+
+def test_stream_gcode_ignores_unsolicited_ok():
+    port = FakeGrbl()
+    port.inbound = b"ok\r\n"
+    cnc = CNC_Controller('/dev/null', CONFIG)
+
+    responses = cnc.stream_gcode(port, ["G0 X1", "G0 X2"])
+
+    assert responses == ['ok', 'ok']
+
+
+def test_stream_gcode_times_out_on_lost_reply():
+    cnc = CNC_Controller('/dev/null', CONFIG)
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        cnc.stream_gcode(FakeGrbl(reply=False), ["G0 X1"], timeout=0.2)
+    assert time.monotonic() - start < 2
+
+
+def test_execute_movement_buffer_is_deprecated(monkeypatch):
+    cnc = CNC_Controller('/dev/null', CONFIG)
+    monkeypatch.setattr(cnc, 'connect', lambda: FakeGrbl())
+    monkeypatch.setattr(cnc, 'wait_for_movement_completion', lambda ser, gcode: None)
+    cnc.gcode = "G0 X1\n"
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        assert cnc.execute_movement(buffer=20) == ['ok']
+    assert any(issubclass(w.category, DeprecationWarning) for w in caught)
+
+
+def test_stream_gcode_respects_grbl_rx_buffer():
+    port = FakeGrbl(delay=0.005)
+    cnc = CNC_Controller('/dev/null', CONFIG)
+    lines = [f"G0 X{i}.000 Y{i}.000" for i in range(60)]  # ~20 bytes each
+
+    responses = cnc.stream_gcode(port, lines)
+
+    assert responses == ['ok'] * len(lines)
+    assert [data.decode().strip() for data in port.written] == lines
+    assert port.max_unacked <= CNC_Controller.RX_BUFFER_SIZE
+    assert port.max_unacked > 2 * len(port.written[0])  # Several lines in flight
+
+
+class StatusPort:
+    """Serial port stand-in that answers each '?' with a fixed reply."""
+
+    timeout = None
+    is_open = True
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.inbound = b""
+
+    @property
+    def in_waiting(self):
+        return len(self.inbound)
+
+    def read(self, n):
+        data, self.inbound = self.inbound[:n], self.inbound[n:]
+        return data
+
+    def reset_input_buffer(self):
+        self.inbound = b""
+
+    def write(self, data):
+        if data.startswith(b"?"):
+            self.inbound += self.reply
+
+
+def status_cnc(reply):
+    cnc = CNC_Controller('/dev/null', CONFIG)
+    cnc.ser = StatusPort(reply)
+    return cnc
+
+
+def test_get_status_grbl_1_1_report():
+    cnc = status_cnc(b"<Idle|MPos:1.000,2.000,-3.000|FS:0,0|Pn:XZ>\r\n")
+    assert cnc.get_status() == {
+        'state': 'Idle', 'MPos': (1.0, 2.0, -3.0), 'FS': (0.0, 0.0), 'Pn': 'XZ',
+    }
+
+
+def test_get_status_grbl_1_1_substate():
+    cnc = status_cnc(b"<Hold:0|MPos:0.000,0.000,0.000|FS:0,0>\r\n")
+    assert cnc.get_status()['state'] == 'Hold'
+
+
+def test_get_status_grbl_0_9_report():
+    cnc = status_cnc(
+        b"<Idle,MPos:1.000,2.000,-3.000,WPos:0.000,0.000,0.000,Buf:0,RX:0>\r\n"
+    )
+    assert cnc.get_status() == {
+        'state': 'Idle', 'MPos': (1.0, 2.0, -3.0), 'WPos': (0.0, 0.0, 0.0),
+        'Buf': (0.0,), 'RX': (0.0,),
+    }
+    assert cnc.read_coordinates() == {'X': 1.0, 'Y': 2.0, 'Z': -3.0}
+
+
+def test_get_status_times_out_without_reply():
+    cnc = status_cnc(b"")
+    start = time.monotonic()
+    assert cnc.get_status(timeout=0.1) is None
+    assert time.monotonic() - start < 1
+
+
+@pytest.mark.parametrize("reply", [b"error:9\r\n", b"ok\r\n", b"<Idle|MPos:0,0\r\n", b"\x00\xff\r\n"])
+def test_get_status_ignores_garbage(reply):
+    assert status_cnc(reply).get_status(timeout=0.1) is None
+
+
+def test_readline_keeps_bytes_after_newline():
+    cnc = CNC_Controller('/dev/null', CONFIG)
+    port = StatusPort(b"")
+    port.inbound = b"ok\r\nerror:2\r\npart"
+
+    assert cnc._readline(port, 0.1) == b"ok\r\n"
+    assert cnc._readline(port, 0.1) == b"error:2\r\n"
+    assert cnc._readline(port, 0.05) == b"part"  # Partial line on timeout
+    assert cnc._readline(port, 0.05) == b""
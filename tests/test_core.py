@@ -0,0 +1,346 @@
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+from dose_every_well.core import DoseResult, MicroDoser
+from dose_every_well.dosing_system import CNCDosingSystem
+
+
+def make_doser(dosing_system=None):
+    """MicroDoser without balance or loader hardware (not used by these tests)."""
+    doser = MicroDoser.__new__(MicroDoser)
+    doser.dosing_system = dosing_system
+    doser._last_xy = None
+    doser._motion_lock = threading.Lock()
+    return doser
+
+
+@pytest.mark.parametrize("well", ["A1", "H12", "P24", "AF48"])
+def test_standalone_accepts_any_plate_label(well):
+    make_doser()._check_well(well)
+
+
+@pytest.mark.parametrize("well", ["A13", "I1", "A01", "Z1"])
+def test_wells_checked_against_dosing_system_plate(well):
+    doser = make_doser(CNCDosingSystem(cnc_port='/dev/null'))
+    with pytest.raises(ValueError):
+        doser._check_well(well)
+
+
+class FakeBalance:
+    """Returns queued (grams, stable) readings, repeating the last one."""
+
+    def __init__(self, readings):
+        self.readings = list(readings)
+
+    def read_reading(self):
+        if len(self.readings) > 1:
+            return self.readings.pop(0)
+        return self.readings[0]
+
+
+def test_read_balance_waits_for_balance_stability_flag():
+    doser = make_doser()
+    doser.balance = FakeBalance([(1.0, False)] * 5 + [(1.0, True)])
+    assert doser.read_balance() == 1.0
+    assert doser.balance.readings == [(1.0, True)]
+
+
+def test_read_balance_warns_when_not_settled(caplog):
+    doser = make_doser()
+    doser.balance = FakeBalance([(1.0, False)])
+    with caplog.at_level('WARNING', logger='dose_every_well.core'):
+        assert doser.read_balance() == 1.0
+    assert "did not settle" in caplog.text
+
+
+class PlateRig:
+    """Balance and dosing system sharing one simulated plate mass."""
+
+    def __init__(self):
+        self.mass_g = 0.0
+        self.events = []
+        self.reads = 0
+
+    # Balance
+    def read_reading(self):
+        self.reads += 1
+        return self.mass_g, True
+
+    # Dosing system (no dispense(): the generic dose_to_well() path)
+    def dose_to_well(self, well, target_mg):
+        self.events.append(('dose', well))
+        self.mass_g += target_mg / 1000
+
+    def position_at_well(self, well):
+        self.events.append(('move', well))
+
+
+class InPlaceRig(PlateRig):
+    """Dosing system that can dispense at the current position."""
+
+    def dispense(self, target_mg, wait=None):
+        wait()
+        self.events.append(('dispense', target_mg))
+        self.mass_g += target_mg / 1000
+
+
+def test_dose_plate_pipeline_dispenses_in_place_after_prefetched_move():
+    rig = InPlaceRig()
+    doser = make_doser(rig)
+    doser.balance = rig
+
+    results = doser.dose_plate({'A1': 1.0, 'A2': 2.0, 'A3': 3.0}, optimize_order=False)
+
+    assert rig.events == [
+        ('dose', 'A1'), ('move', 'A2'), ('dispense', 2.0), ('move', 'A3'), ('dispense', 3.0),
+    ]
+    assert [r.actual_mg for r in results.values()] == pytest.approx([1.0, 2.0, 3.0])
+    assert results['A2'].initial_mg == pytest.approx(results['A1'].final_mg)
+
+
+def test_dose_plate_pipeline_without_in_place_dispense():
+    rig = PlateRig()
+    doser = make_doser(rig)
+    doser.balance = rig
+
+    results = doser.dose_plate({'A1': 1.0, 'A2': 2.0}, optimize_order=False)
+
+    assert rig.events == [('dose', 'A1'), ('move', 'A2'), ('dose', 'A2')]
+    assert results['A2'].actual_mg == pytest.approx(2.0)
+
+
+def test_dose_plate_as_arrays():
+    rig = InPlaceRig()
+    doser = make_doser(rig)
+    doser.balance = rig
+
+    arrays = doser.dose_plate({'A1': 1.0, 'A2': 4.0}, as_arrays=True)
+
+    assert arrays['well'].tolist() == ['A1', 'A2']
+    assert arrays['target_mg'].tolist() == [1.0, 4.0]
+    assert arrays['actual_mg'] == pytest.approx([1.0, 4.0])
+    assert arrays['error_mg'] == pytest.approx([0.0, 0.0], abs=1e-9)
+    assert arrays['error_pct'] == pytest.approx([0.0, 0.0], abs=1e-6)
+
+
+def test_dose_plate_as_arrays_unverified_is_nan():
+    rig = PlateRig()
+    doser = make_doser(rig)
+    doser.balance = rig
+
+    arrays = doser.dose_plate({'A1': 1.0, 'A2': 4.0}, verify=False, as_arrays=True)
+
+    assert np.isnan(arrays['actual_mg']).all()
+    assert np.isnan(arrays['error_pct']).all()
+
+
+class TareBalance:
+    """Balance reading a fixed mass that counts tare() calls."""
+
+    def __init__(self, mass_g=0.0):
+        self.mass_g = mass_g
+        self.tares = 0
+
+    def read_reading(self):
+        return self.mass_g, True
+
+    def tare(self):
+        self.tares += 1
+        self.mass_g = 0.0
+
+
+def loaded_doser(balance):
+    doser = make_doser()
+    doser.balance = balance
+    doser.loader = types.SimpleNamespace(load_plate=lambda: None)
+    doser._last_tare_ts = None
+    return doser
+
+
+def test_load_plate_skips_fresh_tare():
+    balance = TareBalance(mass_g=0.3)
+    doser = loaded_doser(balance)
+
+    doser.load_plate()
+    assert balance.tares == 1  # Never tared before
+    doser.load_plate()
+    assert balance.tares == 1  # Tared just now and still at zero
+
+
+def test_load_plate_tares_when_off_zero_or_stale():
+    balance = TareBalance()
+    doser = loaded_doser(balance)
+    doser.load_plate()
+
+    balance.mass_g = 0.01
+    doser.load_plate()
+    assert balance.tares == 2
+
+    doser._last_tare_ts = time.monotonic() - MicroDoser.TARE_MAX_AGE
+    doser.load_plate()
+    assert balance.tares == 3
+
+
+def test_dose_result_reads_like_the_old_dict():
+    result = DoseResult('A1', 5.0, 10.0, 14.5, 4.5, -0.5)
+
+    assert result['actual_mg'] == 4.5 == result.actual_mg
+    assert result['well'] == 'A1'
+    assert result[0] == 'A1'
+    assert result._asdict()['error_mg'] == -0.5
+    assert DoseResult('A2', 1.0)['final_mg'] is None
+    with pytest.raises(KeyError):
+        result['missing']
+
+
+def test_dose_plate_without_verify_reads_nothing():
+    rig = InPlaceRig()
+    doser = make_doser(rig)
+    doser.balance = rig
+
+    results = doser.dose_plate({'A1': 1.0, 'A2': 2.0}, verify=False, optimize_order=False)
+
+    assert rig.reads == 0
+    assert rig.events == [('dose', 'A1'), ('dose', 'A2')]
+    assert results['A1'] == DoseResult('A1', 1.0)
+
+
+def test_dose_plate_verify_total_weighs_plate_once_before_and_after(caplog):
+    rig = InPlaceRig()
+    rig.mass_g = 0.5
+    doser = make_doser(rig)
+    doser.balance = rig
+
+    with caplog.at_level('INFO', logger='dose_every_well.core'):
+        doser.dose_plate({'A1': 1.0, 'A2': 2.0}, verify=False, verify_total=True)
+
+    assert "Plate total: 3.000 mg dispensed, 3.000 mg target" in caplog.text
+    assert rig.reads == 2 * MicroDoser.STABLE_WINDOW  # One stable read each
+
+
+def test_dose_plate_checks_each_well_once():
+    rig = InPlaceRig()
+    checked = []
+    rig.is_valid_well = lambda well: checked.append(well) or True
+    doser = make_doser(rig)
+    doser.balance = rig
+
+    doser.dose_plate({'A1': 1.0, 'A2': 2.0}, optimize_order=False)
+    doser.dose_plate({'A3': 1.0, 'A4': 2.0}, verify=False, optimize_order=False)
+
+    assert checked == ['A1', 'A2', 'A3', 'A4']
+
+
+class FakeSerial:
+    def __init__(self):
+        self.is_open = True
+        self.closes = 0
+
+    def close(self):
+        self.closes += 1
+        self.is_open = False
+
+
+@pytest.fixture
+def fake_ports(monkeypatch):
+    """Make SartoriusBalance.open_port() hand out FakeSerial instances."""
+    from dose_every_well.sartorius_balance import SartoriusBalance
+
+    opened = []
+
+    def open_port(port, *args, **kwargs):
+        opened.append(FakeSerial())
+        return opened[-1]
+
+    monkeypatch.setattr(SartoriusBalance, 'open_port', staticmethod(open_port))
+    monkeypatch.setattr('dose_every_well.core.tune_serial_latency', lambda port, ser=None: None)
+    return opened
+
+
+def test_balance_port_is_opened_once_and_reopened_when_closed(fake_ports):
+    doser = make_doser()
+    doser._ports = {}
+
+    first = doser._get_or_open_balance_port('/dev/ttyUSB1')
+    assert doser._get_or_open_balance_port('/dev/ttyUSB1') is first
+    assert len(fake_ports) == 1
+
+    first.close()
+    assert doser._get_or_open_balance_port('/dev/ttyUSB1') is not first
+    assert len(fake_ports) == 2
+
+
+def test_shutdown_closes_each_port_once(fake_ports):
+    from dose_every_well.sartorius_balance import SartoriusBalance
+
+    doser = make_doser()
+    doser._ports = {}
+    doser._plate_loaded = False
+    doser.loader = types.SimpleNamespace(shutdown=lambda: None)
+    port = doser._get_or_open_balance_port('/dev/ttyUSB1')
+    doser.balance = SartoriusBalance(com_port='/dev/ttyUSB1', ser=port)
+    spare = doser._get_or_open_balance_port('/dev/ttyUSB2')
+
+    doser.shutdown()
+
+    assert port.closes == 1  # Balance and MicroDoser share one connection
+    assert spare.closes == 1
+    assert doser._ports == {}
+
+
+class StatusLoader:
+    """Plate loader that counts get_status() queries."""
+
+    def __init__(self):
+        self.queries = 0
+
+    def get_status(self):
+        self.queries += 1
+        return 'ready'
+
+
+def status_doser(dosing_system=None):
+    doser = make_doser(dosing_system)
+    doser.balance = None
+    doser.loader = StatusLoader()
+    doser._plate_loaded = False
+    doser._loader_has_status = True
+    doser._status_cache = {}
+    doser._status_dirty = True
+    doser._loader_status = 'unknown'
+    doser._loader_status_ts = None
+    return doser
+
+
+def test_get_status_is_cached_within_ttl():
+    doser = status_doser()
+
+    first = doser.get_status()
+    second = doser.get_status()
+
+    assert first == second == {
+        'plate_loaded': False, 'balance_connected': False,
+        'dosing_system_connected': False, 'loader_status': 'ready',
+    }
+    assert doser.loader.queries == 1
+    assert doser._status_dirty is False
+
+
+def test_moves_and_dispenses_mark_status_stale():
+    rig = InPlaceRig()
+    doser = status_doser(rig)
+    doser.get_status()
+
+    doser._position_at_well('A1')
+    assert doser._status_dirty
+    doser.get_status()
+    assert doser.loader.queries == 2
+
+    doser._dispense('A1', 1.0)
+    assert doser._status_dirty
+    doser.get_status()
+    assert doser.loader.queries == 3
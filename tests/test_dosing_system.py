@@ -0,0 +1,426 @@
+import asyncio
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+from dose_every_well.dosing_system import _PLATE_SPECS, _VALID_WELLS, CNCDosingSystem, _parse_well
+
+
+class FakePort:
+    def __init__(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+
+class FakeCNC:
+    """Stands in for CNC_Controller: records moves, no serial I/O."""
+
+    X_OFFSET = 0.0
+    Y_OFFSET = 0.0
+
+    def __init__(self):
+        self.ser = None
+        self.sent = []
+        self.homes = 0
+        self.state = 'Idle'
+
+    def connect(self):
+        if self.ser is None:
+            self.ser = FakePort()
+        return self.ser
+
+    def disconnect(self):
+        if self.ser is not None:
+            self.ser.close()
+
+    def get_status(self):
+        return {'state': self.state}
+
+    def home_xyz(self):
+        self.homes += 1
+
+    def format_move(self, x, y):
+        return f"G0 X{x:.3f} Y{y:.3f}\n".encode()
+
+    def write_raw(self, data):
+        self.sent.append(data)
+
+
+def test_failed_initialize_in_with_closes_cnc_port(monkeypatch):
+    def broken_doser(**kwargs):
+        raise OSError("No I2C device at 0x40")
+
+    fake_module = types.ModuleType('dose_every_well.solid_doser')
+    fake_module.SolidDoser = broken_doser
+    monkeypatch.setitem(sys.modules, 'dose_every_well.solid_doser', fake_module)
+
+    cnc = FakeCNC()
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+    dosing.cnc = cnc
+
+    with pytest.raises(OSError):
+        with dosing:
+            pass
+
+    assert not cnc.ser.is_open
+    assert dosing.cnc is None
+
+
+def test_initialize_tunes_open_cnc_port(monkeypatch):
+    tuned = []
+    monkeypatch.setattr(
+        'dose_every_well.dosing_system.tune_serial_latency',
+        lambda port, ser=None: tuned.append((port, ser))
+    )
+    dosing = CNCDosingSystem(cnc_port='/dev/ttyUSB0')
+    dosing.cnc = FakeCNC()
+    dosing.doser = object()
+
+    dosing.initialize()
+
+    assert tuned == [('/dev/ttyUSB0', dosing.cnc.ser)]
+    assert dosing.cnc.ser is not None
+
+
+class BoundedCNC(FakeCNC):
+    """FakeCNC whose X travel ends at 50 mm."""
+
+    def format_move(self, x, y):
+        if x > 50:
+            raise ValueError(f"Cannot move to {x}, {y}, coordinates not within bounds")
+        return super().format_move(x, y)
+
+
+def test_initialize_skips_unreachable_wells(caplog):
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+    dosing.cnc = BoundedCNC()
+    dosing.doser = object()
+
+    with caplog.at_level('WARNING', logger='dose_every_well.dosing_system'):
+        dosing.initialize()
+
+    assert "48 wells of the 96-well plate are outside the CNC bounds" in caplog.text
+    dosing.position_at_well('A6')
+    assert dosing.cnc.sent == [b"G0 X45.000 Y0.000\n"]
+    with pytest.raises(ValueError):
+        dosing.position_at_well('A7')
+
+
+def test_prompt_returns_lines_sent_in_one_burst(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"\n5.0\n")
+    monkeypatch.setattr(sys, 'stdin', os.fdopen(read_fd))
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+
+    async def answers():
+        first = await dosing._prompt("Start? ", timeout=1.0)
+        second = await dosing._prompt("Mass? ", timeout=1.0)
+        return first, second
+
+    try:
+        assert asyncio.run(answers()) == ("", "5.0")
+    finally:
+        os.close(write_fd)
+        sys.stdin.close()
+
+
+def test_prompt_leaves_later_lines_in_stdin(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"5.0\nnext\n")
+    monkeypatch.setattr(sys, 'stdin', os.fdopen(read_fd))
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+
+    try:
+        assert asyncio.run(dosing._prompt("Mass? ", timeout=1.0)) == "5.0"
+        assert sys.stdin.readline() == "next\n"
+    finally:
+        os.close(write_fd)
+        sys.stdin.close()
+
+
+def test_prompt_after_input_sees_buffered_lines(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"Y\n\n")
+    os.close(write_fd)
+    monkeypatch.setattr(sys, 'stdin', os.fdopen(read_fd))
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+
+    try:
+        assert input() == "Y"  # Buffers the second line in sys.stdin
+        assert asyncio.run(dosing._prompt("Start? ", timeout=1.0)) == ""
+        with pytest.raises(EOFError):
+            asyncio.run(dosing._prompt("Mass? ", timeout=1.0))
+    finally:
+        sys.stdin.close()
+
+
+def test_prompt_times_out_without_input(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    monkeypatch.setattr(sys, 'stdin', os.fdopen(read_fd))
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(dosing._prompt("Start? ", timeout=0.1))
+    finally:
+        os.close(write_fd)
+        sys.stdin.close()
+
+
+def test_plan_cache_dir_follows_xdg_cache_home(monkeypatch, tmp_path):
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert dosing._plan_cache_dir() == tmp_path / 'dose_every_well'
+
+
+def test_plan_cache_dir_without_home(monkeypatch):
+    def no_home():
+        raise RuntimeError("Could not determine home directory.")
+
+    monkeypatch.delenv('XDG_CACHE_HOME', raising=False)
+    monkeypatch.setattr('pathlib.Path.home', no_home)
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+    assert dosing._plan_cache_dir().name == 'dose_every_well'
+
+
+class FakeDoser:
+    def __init__(self):
+        self.durations = []
+
+    def dispense(self, duration, gate_position=None):
+        self.durations.append(duration)
+
+
+def make_dose_many_system():
+    dosing = CNCDosingSystem(cnc_port='/dev/null', flow_rate=2.0)
+    dosing.cnc = FakeCNC()
+    dosing.doser = FakeDoser()
+    return dosing
+
+
+def test_dose_many_visits_nearest_wells_first():
+    dosing = make_dose_many_system()
+
+    dosed = dosing.dose_many([('A1', 1.0), ('H12', 4.0), ('A2', 2.0)])
+
+    assert dosed == ['A1', 'A2', 'H12']
+    assert dosing.cnc.sent == [
+        b"G0 X0.000 Y0.000\n", b"G0 X9.000 Y0.000\n", b"G0 X99.000 Y63.000\n",
+    ]
+    assert dosing.doser.durations == [0.5, 1.0, 2.0]
+
+
+@pytest.mark.parametrize("optimize, expected", [
+    ('serpentine', ['A1', 'A2', 'B2', 'B1']),
+    (None, ['B1', 'A2', 'A1', 'B2']),
+])
+def test_dose_many_order_modes(optimize, expected):
+    dosing = make_dose_many_system()
+    jobs = [('B1', 1.0), ('A2', 1.0), ('A1', 1.0), ('B2', 1.0)]
+    assert dosing.dose_many(jobs, optimize=optimize) == expected
+
+
+def test_dose_many_rejects_unknown_order_and_wells():
+    dosing = make_dose_many_system()
+    with pytest.raises(ValueError):
+        dosing.dose_many([('A1', 1.0)], optimize='random')
+    with pytest.raises(ValueError):
+        dosing.dose_many([('A1', 1.0), ('I1', 1.0)])
+    assert dosing.cnc.sent == []
+
+
+class FakeSplitDoser:
+    """Doser with the prepare_dispense()/trigger_dispense() split API."""
+
+    def __init__(self):
+        self.events = []
+        self.spun_up = threading.Event()
+
+    def prepare_dispense(self):
+        self.events.append('spin up')
+        self.spun_up.set()
+
+    def trigger_dispense(self, duration, gate_position=None):
+        self.events.append(('dispense', duration))
+
+    def motor_off(self):
+        self.events.append('motor off')
+
+
+def test_dispense_spins_up_while_waiting_for_move():
+    dosing = CNCDosingSystem(cnc_port='/dev/null', flow_rate=2.0)
+    dosing.doser = FakeSplitDoser()
+
+    def wait_for_move():
+        assert dosing.doser.spun_up.wait(1.0)
+        dosing.doser.events.append('in place')
+
+    dosing.dispense(2.0, wait=wait_for_move)
+
+    assert dosing.doser.events == ['spin up', 'in place', ('dispense', 1.0)]
+
+
+def test_initialize_skips_homing_when_homed_and_idle():
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+    dosing.cnc = FakeCNC()
+    dosing.doser = types.SimpleNamespace(home=lambda: None)
+
+    dosing.initialize()
+    dosing.initialize()
+    assert dosing.cnc.homes == 1
+
+    dosing.cnc.state = 'Alarm'
+    dosing.initialize()
+    assert dosing.cnc.homes == 2
+
+    dosing.initialize(force_home=True)
+    assert dosing.cnc.homes == 3
+
+
+class FailingCNC(FakeCNC):
+    def write_raw(self, data):
+        raise RuntimeError("error:9")
+
+
+def test_failed_move_makes_initialize_rehome():
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+    dosing.cnc = FailingCNC()
+    dosing.doser = object()
+    dosing.initialize()
+
+    with pytest.raises(RuntimeError):
+        dosing.position_at_well('A1')
+    dosing.initialize()
+
+    assert dosing.cnc.homes == 2
+
+
+@pytest.mark.parametrize("well", ["", "1A", "A", "AAA1", "A1B"])
+def test_parse_well_rejects_malformed(well):
+    with pytest.raises(ValueError):
+        _parse_well(well)
+
+
+def test_calibration_interpolates_and_extrapolates():
+    dosing = CNCDosingSystem(cnc_port='/dev/null', flow_rate=2.0)
+    assert dosing._calculate_duration(4.0) == 2.0  # flow_rate without a table
+
+    dosing.add_calibration_point(10.0, 4.0, save=False)
+    dosing.add_calibration_point(2.0, 1.0, save=False)
+
+    assert dosing._calculate_duration(1.0) == pytest.approx(0.5)  # Anchored at (0, 0)
+    assert dosing._calculate_duration(6.0) == pytest.approx(2.5)
+    assert dosing._calculate_duration(20.0) == pytest.approx(8.0)  # Last point's rate
+    assert dosing._calculate_durations([1.0, 6.0, 20.0]) == pytest.approx([0.5, 2.5, 8.0])
+
+
+def test_calibration_table_round_trips_through_json(tmp_path):
+    path = tmp_path / 'calibration.json'
+    dosing = CNCDosingSystem(cnc_port='/dev/null', calibration_path=path)
+    dosing.add_calibration_point(2.0, 1.0)
+    dosing.add_calibration_point(10.0, 4.0)
+
+    reloaded = CNCDosingSystem(cnc_port='/dev/null', calibration_path=path)
+
+    assert reloaded._cal_points == [(2.0, 1.0), (10.0, 4.0)]
+    assert reloaded._calculate_duration(6.0) == pytest.approx(2.5)
+    with pytest.raises(ValueError):
+        reloaded.add_calibration_point(0.0, 1.0)
+
+
+def test_compile_and_run_plan_round_trip(tmp_path):
+    dosing = CNCDosingSystem(cnc_port='/dev/null', flow_rate=2.0)
+    dosing.PLAN_CACHE_DIR = tmp_path
+    dosing.cnc = FakeCNC()
+    dosing.doser = FakeDoser()
+    jobs = [('A1', 1.0), ('H12', 4.0), ('A2', 2.0)]
+
+    path = dosing.compile_plan('screen', jobs)
+    assert path.parent == tmp_path
+    assert dosing.compile_plan('screen', jobs) == path  # Cached
+
+    dosed = dosing.run_plan(path)
+
+    assert dosed == ['A1', 'A2', 'H12']  # Nearest-neighbor order
+    assert dosing.cnc.sent == [
+        b"G0 X0.000 Y0.000\n", b"G0 X9.000 Y0.000\n", b"G0 X99.000 Y63.000\n",
+    ]
+    assert dosing.doser.durations == [0.5, 1.0, 2.0]
+
+
+def test_compile_plan_key_includes_cnc_offsets(tmp_path):
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+    dosing.PLAN_CACHE_DIR = tmp_path
+    dosing.cnc = FakeCNC()
+    first = dosing.compile_plan('screen', [('A1', 1.0)])
+    dosing.cnc.X_OFFSET = 5.0
+    assert dosing.compile_plan('screen', [('A1', 1.0)]) != first
+
+
+def test_run_plan_rejects_dose_before_move(tmp_path):
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+    dosing.cnc = FakeCNC()
+    plan = tmp_path / 'bad.nc'
+    plan.write_bytes(b"(DOSE A1 0.500)\n")
+    with pytest.raises(ValueError):
+        dosing.run_plan(plan)
+
+
+def test_well_xy_follows_plate_geometry():
+    dosing = CNCDosingSystem(cnc_port='/dev/null')
+    assert dosing.well_xy('B3') == (18.0, 9.0)
+    assert dosing.well_xy('B3', '384') == (9.0, 4.5)
+    dosing.plate_origin = (50, 20)
+    assert dosing.well_xy('A1') == (50.0, 20.0)
+    with pytest.raises(ValueError):
+        dosing.well_xy('I1')
+
+
+@pytest.mark.parametrize("plate_format, last_well", [
+    ('96', 'H12'), ('384', 'P24'), ('1536', 'AF48'),
+])
+def test_valid_wells_per_plate_format(plate_format, last_well):
+    rows, cols, _ = _PLATE_SPECS[plate_format]
+    valid = _VALID_WELLS[plate_format]
+
+    assert len(valid) == 2 * rows * cols  # Upper and lower case
+    assert 'A1' in valid and last_well in valid and last_well.lower() in valid
+    assert _parse_well(last_well) == (rows - 1, cols - 1)
+    assert CNCDosingSystem.is_valid_well(last_well, plate_format)
+    assert not CNCDosingSystem.is_valid_well(f"A{cols + 1}", plate_format)
+    assert not CNCDosingSystem.is_valid_well("A01", plate_format)
+
+
+def test_truncated_cached_plan_is_recompiled_not_replayed(tmp_path):
+    dosing = make_dose_many_system()
+    dosing.PLAN_CACHE_DIR = tmp_path
+    jobs = [('A1', 1.0), ('A2', 2.0), ('A3', 3.0)]
+    path = dosing.compile_plan('screen', jobs)
+    full = path.read_bytes()
+    path.write_bytes(full[:full.index(b"(DOSE A2")])  # Interrupted write
+
+    with pytest.raises(ValueError):
+        dosing.run_plan(path)
+    assert dosing.cnc.sent == [] and dosing.doser.durations == []
+
+    assert dosing.compile_plan('screen', jobs) == path
+    assert path.read_bytes() == full
+    assert dosing.run_plan(path) == ['A1', 'A2', 'A3']
+
+
+def test_failed_plan_write_leaves_no_file(tmp_path, monkeypatch):
+    dosing = make_dose_many_system()
+    dosing.PLAN_CACHE_DIR = tmp_path
+
+    def interrupted(src, dst):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(os, 'replace', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        dosing.compile_plan('screen', [('A1', 1.0)])
+    assert list(tmp_path.iterdir()) == []
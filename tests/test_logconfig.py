@@ -0,0 +1,81 @@
+import logging
+import threading
+
+import pytest
+
+from dose_every_well import _logconfig
+from dose_every_well._logconfig import configure_once
+
+
+class ListHandler(logging.Handler):
+    """Collects formatted messages and the thread that handled them."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+        self.threads.add(threading.current_thread())
+
+
+@pytest.fixture
+def bare_root(monkeypatch):
+    """
+    Fresh configure_once() state; restores the root logger afterwards.
+
+    pytest adds its capture handlers to the root logger only while the test
+    body runs, so each test clears them with clear_handlers() first.
+    """
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    monkeypatch.setattr(_logconfig, '_configured', False)
+    monkeypatch.setattr(_logconfig, '_listener', None)
+    yield root
+    _logconfig._stop_listener()
+    root.handlers[:] = saved_handlers
+    root.setLevel(saved_level)
+
+
+def clear_handlers(root):
+    root.handlers.clear()
+    root.setLevel(logging.WARNING)
+
+
+def test_records_reach_listener_handlers(bare_root):
+    clear_handlers(bare_root)
+    collector = ListHandler()
+    configure_once(handlers=[collector])
+
+    logging.getLogger('dose_every_well.test').info("Dosed %.1f mg", 5.0)
+    _logconfig._stop_listener()  # Flushes the queue
+
+    assert len(collector.messages) == 1
+    assert collector.messages[0].endswith("dose_every_well.test - INFO - Dosed 5.0 mg")
+    assert threading.current_thread() not in collector.threads
+    assert [type(h) for h in bare_root.handlers] == [_logconfig._DeferredQueueHandler]
+
+
+def test_second_call_does_nothing(bare_root):
+    clear_handlers(bare_root)
+    configure_once()
+    handlers = bare_root.handlers[:]
+    listener = _logconfig._listener
+
+    configure_once(level=logging.DEBUG, handlers=[ListHandler()])
+
+    assert bare_root.handlers == handlers
+    assert _logconfig._listener is listener
+    assert bare_root.level == logging.INFO
+
+
+def test_existing_root_handlers_are_left_alone(bare_root):
+    clear_handlers(bare_root)
+    app_handler = ListHandler()
+    bare_root.addHandler(app_handler)
+
+    configure_once()
+
+    assert bare_root.handlers == [app_handler]
+    assert _logconfig._listener is None
@@ -0,0 +1,38 @@
+import numpy as np
+
+from dose_every_well.planning import nearest_neighbor_order, serpentine_order, tour_length
+
+
+def test_nearest_neighbor_order_visits_closest_first():
+    xy = np.array([[0, 0], [10, 0], [1, 0], [11, 0]])
+    assert nearest_neighbor_order(xy).tolist() == [0, 2, 1, 3]
+
+
+def test_nearest_neighbor_order_from_start_position():
+    xy = np.array([[0, 0], [10, 0], [1, 0]])
+    assert nearest_neighbor_order(xy, start=(12, 0)).tolist() == [1, 2, 0]
+
+
+def test_nearest_neighbor_order_is_permutation_and_not_longer():
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(0, 100, size=(96, 2))
+    order = nearest_neighbor_order(xy)
+    assert sorted(order.tolist()) == list(range(96))
+    assert tour_length(xy, order) < tour_length(xy, np.arange(96))
+
+
+def test_nearest_neighbor_order_empty():
+    assert nearest_neighbor_order(np.empty((0, 2))).size == 0
+
+
+def test_serpentine_order():
+    rows = [0, 0, 0, 1, 1, 1]
+    cols = [0, 1, 2, 0, 1, 2]
+    assert serpentine_order(rows, cols).tolist() == [0, 1, 2, 5, 4, 3]
+    assert serpentine_order([], []).size == 0
+
+
+def test_tour_length():
+    xy = np.array([[0, 0], [3, 4], [3, 0]])
+    assert tour_length(xy, [0, 1, 2]) == 9.0
+    assert tour_length(xy, [0]) == 0.0
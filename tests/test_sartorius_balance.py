@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from dose_every_well.sartorius_balance import SartoriusBalance, is_stable, parse_frames
+
+
+@pytest.mark.parametrize("frame, grams", [
+    (b"+    0.0234 g  ", 0.0234),
+    (b"-    0.0234 g  ", -0.0234),
+    (b"N     +    0.0234 g  ", 0.0234),
+    (b"+   23.4 mg", 0.0234),
+    (b"+    1.2 kg", 1200.0),
+    (b"+    1.2", 1.2),  # Unstable: unit left blank
+])
+def test_parse_frame(frame, grams):
+    assert SartoriusBalance._parse_frame(frame) == pytest.approx(grams)
+
+
+@pytest.mark.parametrize("frame", [
+    b"Err 02", b"ERR 101", b"  High", b"Low", b"Stat  07", b"", b"junk",
+    b"N   Err 54", b"N     ERR 101", b"ID  Stat 07", b"N     High",
+])
+def test_parse_frame_rejects_non_weight_frames(frame):
+    with pytest.raises(ValueError):
+        SartoriusBalance._parse_frame(frame)
+
+
+def test_parse_reading_stability_flag():
+    assert SartoriusBalance._parse_reading(b"+    0.0234 g  ") == (0.0234, True)
+    assert SartoriusBalance._parse_reading(b"+    0.0234    ") == (0.0234, False)
+
+
+def test_parse_frames_skips_errors_and_keeps_partial_frame():
+    buf = b"+    1.0 g  \r\nErr 02\r\nN  -  2.5 mg\r\n  High\r\n+    3.0"
+    readings, consumed = parse_frames(buf)
+
+    assert readings == [(1.0, True), (pytest.approx(-0.0025), True)]
+    assert buf[consumed:] == b"+    3.0"
+
+
+def test_parse_frames_skips_id_prefixed_errors():
+    buf = b"N   Err 54\r\n+    1.0 g  \r\nN     Stat 07\r\n"
+    assert parse_frames(buf) == ([(1.0, True)], len(buf))
+
+
+def test_parse_frames_unstable_and_empty():
+    assert parse_frames(b"+    1.0    \r\n") == ([(1.0, False)], 14)
+    assert parse_frames(b"") == ([], 0)
+
+
+def test_is_stable():
+    assert is_stable([1.00, 1.01, 0.99, 1.00])
+    assert not is_stable([1.0, 1.5, 0.5, 1.0])
+
+
+def test_is_stable_near_zero_uses_absolute_floor():
+    # CV is huge around zero, but the spread is below floor_g
+    assert is_stable([0.00001, -0.00002, 0.00003, 0.0])
+    assert not is_stable([0.001, -0.001, 0.002, -0.002])
+
+
+def monitored_balance(readings):
+    """Balance whose monitor 'receives' the (grams, stable) readings shortly after."""
+    balance = SartoriusBalance(ser=object())
+    balance._monitor = threading.current_thread()  # Marks monitoring as running
+
+    def feed():
+        now = time.monotonic()
+        balance.readings.extend((now, mass, stable) for mass, stable in readings)
+
+    threading.Timer(0.05, feed).start()
+    return balance
+
+
+def test_latest_stable_returns_mean_of_settled_window():
+    balance = monitored_balance([(1.0, True), (1.01, True), (0.99, True), (1.0, True)])
+    assert balance.latest_stable(window=4, timeout=1.0) == pytest.approx(1.0)
+
+
+def test_latest_stable_requires_balance_stability_flag():
+    balance = monitored_balance([(1.0, True), (1.0, False), (1.0, True), (1.0, True)])
+    with pytest.raises(TimeoutError):
+        balance.latest_stable(window=4, timeout=0.3)
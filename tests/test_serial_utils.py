@@ -0,0 +1,36 @@
+from dose_every_well import serial_utils
+from dose_every_well.serial_utils import tune_serial_latency
+
+
+class LowLatencyPort:
+    def __init__(self):
+        self.low_latency = []
+
+    def set_low_latency_mode(self, enable):
+        self.low_latency.append(enable)
+
+
+def test_reopened_port_gets_low_latency_flag_again(monkeypatch):
+    timer_writes = []
+    monkeypatch.setattr(serial_utils.platform, 'system', lambda: "Linux")
+    monkeypatch.setattr(serial_utils, '_tuned_ports', set())
+    monkeypatch.setattr(serial_utils, '_set_latency_timer', timer_writes.append)
+
+    first, reopened = LowLatencyPort(), LowLatencyPort()
+    tune_serial_latency('/dev/ttyUSB0', first)
+    tune_serial_latency('/dev/ttyUSB0', reopened)
+
+    assert timer_writes == ['/dev/ttyUSB0']  # sysfs written once per port
+    assert first.low_latency == [True]
+    assert reopened.low_latency == [True]
+
+
+def test_tuning_is_skipped_off_linux(monkeypatch):
+    monkeypatch.setattr(serial_utils.platform, 'system', lambda: "Windows")
+    monkeypatch.setattr(serial_utils, '_tuned_ports', set())
+    port = LowLatencyPort()
+
+    tune_serial_latency('COM3', port)
+
+    assert port.low_latency == []
+    assert serial_utils._tuned_ports == set()